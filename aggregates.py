@@ -0,0 +1,49 @@
+class Aggregate:
+
+    function = None
+
+    def __init__(self, field=None, distinct=False):
+        assert isinstance(distinct, bool), "distinct param must be of type bool"
+        assert field is not None or not distinct, "distinct requires a field"
+        self.field = field
+        self.distinct = distinct
+
+    def sql(self, table):
+        column = "*" if self.field is None else f"{table}.{self.field}"
+        distinct = "DISTINCT " if self.distinct else ""
+        return f"{self.function}({distinct}{column})"
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.sql('')} >"
+
+
+class Count(Aggregate):
+    function = "COUNT"
+
+
+class Sum(Aggregate):
+    function = "SUM"
+
+    def __init__(self, field, distinct=False):
+        super().__init__(field, distinct)
+
+
+class Avg(Aggregate):
+    function = "AVG"
+
+    def __init__(self, field, distinct=False):
+        super().__init__(field, distinct)
+
+
+class Min(Aggregate):
+    function = "MIN"
+
+    def __init__(self, field):
+        super().__init__(field)
+
+
+class Max(Aggregate):
+    function = "MAX"
+
+    def __init__(self, field):
+        super().__init__(field)
@@ -0,0 +1,206 @@
+import asyncio
+import concurrent.futures
+import functools
+import itertools
+
+from sqliter import Database
+
+
+__all__ = ["AsyncDatabase", "AsyncTable", "AsyncQuerySet"]
+
+
+class AsyncDatabase:
+    """
+    asyncio front-end of Database: every operation runs on a dedicated thread,
+    which owns the connections, so the event loop is never blocked.
+    N.B.: entries are plain Entry objects, save/delete them and resolve their
+    foreign keys through .save(entry), .delete(entry) and .related(entry, field)
+    """
+
+    def __init__(self, __db_name, batch_size=500, **kwargs):
+        self.db_name = __db_name
+        self.batch_size = batch_size    # rows sent back to the event loop at a time by async for
+        self.__executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqliter")
+        # the database is created in its thread, before any other operation
+        self.__database = self.__executor.submit(Database, __db_name, **kwargs)
+
+    @property
+    def database(self):
+        return self.__database.result()
+
+    async def run(self, function, *args, **kwargs):
+        """
+        Runs function(*args, **kwargs) in the database thread
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.__executor, functools.partial(function, *args, **kwargs))
+
+    async def __call(self, method, *args, **kwargs):
+        # self.database is resolved in the database thread too, never blocking the event loop
+        return await self.run(lambda: getattr(self.database, method)(*args, **kwargs))
+
+    async def raw(self, sql):
+        return await self.__call("raw", sql)
+
+    async def tables(self):
+        return await self.run(lambda: self.database.tables)
+
+    async def table(self, name):
+        return AsyncTable(self, await self.__call("table", name))
+
+    async def create_table(self, table_name, **kwargs):
+        return AsyncTable(self, await self.__call("create_table", table_name, **kwargs))
+
+    async def create_table_if_not_exists(self, table_name, **kwargs):
+        return AsyncTable(self, await self.__call("create_table_if_not_exists", table_name, **kwargs))
+
+    async def save(self, entry):
+        return await self.run(entry.save)
+
+    async def delete(self, entry):
+        return await self.run(entry.delete)
+
+    async def related(self, entry, field):
+        return await self.run(getattr, entry, field)
+
+    async def close(self):
+        await self.__call("close")
+        self.__executor.shutdown()
+
+
+class AsyncTable:
+
+    def __init__(self, __database, __table):
+        self.database = __database
+        self.table = __table
+        self.name = __table.name
+        self.fields = __table.fields
+        self.columns = __table.columns
+        self.pk = __table.pk
+
+    def all(self):
+        return AsyncQuerySet(self.database, self.table.all())
+
+    def filter(self, operator="AND", **kwargs):
+        return AsyncQuerySet(self.database, self.table.filter(operator=operator, **kwargs))
+
+    async def get(self, **kwargs):
+        return await self.database.run(self.table.get, **kwargs)
+
+    async def create(self, returning=True, **kwargs):
+        return await self.database.run(self.table.create, returning, **kwargs)
+
+    async def create_or_replace(self, returning=True, **kwargs):
+        return await self.database.run(self.table.create_or_replace, returning, **kwargs)
+
+    async def create_or_ignore(self, returning=True, **kwargs):
+        return await self.database.run(self.table.create_or_ignore, returning, **kwargs)
+
+    async def bulk_create(self, iterable, **kwargs):
+        return await self.database.run(self.table.bulk_create, iterable, **kwargs)
+
+    async def bulk_create_or_replace(self, iterable, **kwargs):
+        return await self.database.run(self.table.bulk_create_or_replace, iterable, **kwargs)
+
+    async def bulk_create_or_ignore(self, iterable, **kwargs):
+        return await self.database.run(self.table.bulk_create_or_ignore, iterable, **kwargs)
+
+    async def upsert(self, conflict, update=None, returning=True, **kwargs):
+        return await self.database.run(self.table.upsert, conflict, update, returning, **kwargs)
+
+    async def bulk_upsert(self, iterable, conflict, **kwargs):
+        return await self.database.run(self.table.bulk_upsert, iterable, conflict, **kwargs)
+
+    async def bulk_update(self, iterable, fields, **kwargs):
+        return await self.database.run(self.table.bulk_update, iterable, fields, **kwargs)
+
+    async def load_csv(self, path, **kwargs):
+        return await self.database.run(self.table.load_csv, path, **kwargs)
+
+    async def export_csv(self, path):
+        return await self.database.run(self.table.export_csv, path)
+
+    async def clear(self):
+        return await self.database.run(self.table.clear)
+
+    async def drop(self):
+        return await self.database.run(self.table.drop)
+
+
+class AsyncQuerySet:
+    """
+    Wraps a QuerySet: building methods are synchronous (no query involved), the others are awaitable.
+    async for streams the results in batches of AsyncDatabase.batch_size
+    """
+
+    def __init__(self, __database, __queryset):
+        self.database = __database
+        self.queryset = __queryset
+
+    def __chain(self, method, *args, **kwargs):
+        method(*args, **kwargs)
+        return self
+
+    def order_by(self, field):
+        return self.__chain(self.queryset.order_by, field)
+
+    def select_related(self, *fields):
+        return self.__chain(self.queryset.select_related, *fields)
+
+    def prefetch_related(self, *fields):
+        return self.__chain(self.queryset.prefetch_related, *fields)
+
+    def values(self, *fields, coerce=False):
+        return self.__chain(self.queryset.values, *fields, coerce=coerce)
+
+    def values_list(self, *fields, flat=False, coerce=False):
+        return self.__chain(self.queryset.values_list, *fields, flat=flat, coerce=coerce)
+
+    def tuples(self):
+        return self.__chain(self.queryset.tuples)
+
+    def group_by(self, *fields):
+        return self.__chain(self.queryset.group_by, *fields)
+
+    def annotate(self, **aggregates):
+        return self.__chain(self.queryset.annotate, **aggregates)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return AsyncQuerySet(self.database, self.queryset[key])
+        return self.database.run(self.queryset.__getitem__, key)    # to be awaited
+
+    async def first(self):
+        return await self.database.run(self.queryset.first)
+
+    async def count(self):
+        return await self.database.run(self.queryset.count)
+
+    async def exists(self):
+        return await self.database.run(self.queryset.exists)
+
+    async def aggregate(self, **aggregates):
+        return await self.database.run(self.queryset.aggregate, **aggregates)
+
+    async def update(self, **kwargs):
+        return await self.database.run(self.queryset.update, **kwargs)
+
+    async def delete(self):
+        return await self.database.run(self.queryset.delete)
+
+    async def __stream(self, iterator):
+        try:
+            while True:
+                batch = await self.database.run(list, itertools.islice(iterator, self.database.batch_size))
+                if not batch:
+                    return
+                for result in batch:
+                    yield result
+        finally:
+            await self.database.run(iterator.close)    # in the database thread, releasing its connection
+
+    def __aiter__(self):
+        return self.__stream(iter(self.queryset))
+
+    def iterator(self, chunk_size=1000):
+        return self.__stream(self.queryset.iterator(chunk_size))
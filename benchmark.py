@@ -0,0 +1,258 @@
+"""
+Benchmarks of the hot paths of sqliter, on the persons/dogs schema of the README.
+
+    python benchmark.py --rows 10000 100000 --databases memory file --output bench.json
+
+Each benchmark reports ops/sec, the p50/p99 latency of an op, the statements issued per op
+(counted through the trace callback of sqlite3, transaction control ones apart) and the peak memory
+allocated while running it. Statements and memory are measured in separate, shorter runs,
+not to slow down the timed one. The results are emitted as JSON,
+to compare them across commits.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from field_types import FieldTypes
+from sqliter import Database, Fields
+
+
+CITIES = ["London", "Paris", "Rome", "Berlin", "Madrid"]
+DOG_NAMES = ["Max", "Charlie", "Bella", "Lucy", "Molly", "Rocky"]
+START = datetime.datetime(2000, 1, 1)
+
+
+def create_persons(database, name):
+    return database.create_table(
+        name,
+        id=Fields.Integer(pk=True),
+        name=Fields.Text(null=False),
+        city=Fields.Text(null=False, default="London"),
+        birthday=Fields.Date(),
+        created=Fields.DateTime(),
+    )
+
+
+def create_schema(database):
+    persons = create_persons(database, "persons")
+    dogs = database.create_table(
+        "dogs",
+        id=Fields.Integer(pk=True),
+        name=Fields.Text(null=False),
+        age=Fields.Integer(null=False),
+        owner=Fields.ForeignKey(persons, on_delete=Fields.CASCADE),
+    )
+    return persons, dogs
+
+
+def person(i):
+    created = START + datetime.timedelta(seconds=i * 37, microseconds=i % 1000)
+    return dict(name=f"person {i}", city=CITIES[i % len(CITIES)], birthday=created.date(), created=created)
+
+
+def dog(i, persons_count):
+    return dict(name=DOG_NAMES[i % len(DOG_NAMES)], age=i % 15, owner=i % persons_count + 1)
+
+
+class Counter:
+    """
+    Counts the statements run by SQLite, through the trace callback of the connections:
+    the transaction control ones (BEGIN, COMMIT, ...) apart
+    """
+
+    TRANSACTION = ("BEGIN", "COMMIT", "END", "ROLLBACK", "SAVEPOINT", "RELEASE")
+
+    def __init__(self, database):
+        self.count = 0
+        self.transactions = 0
+        database.set_trace_callback(self)
+
+    def __call__(self, sql):
+        if sql.lstrip().upper().startswith(self.TRANSACTION):
+            self.transactions += 1
+        else:
+            self.count += 1
+
+
+class Benchmark:
+    """
+    op(i) is run ops times, after setup() if any. items: rows handled per op (e.g. by a scan), for rows/sec
+    """
+
+    def __init__(self, name, op, ops, setup=None, items=1, memory_ops=None):
+        self.name = name
+        self.op = op
+        self.ops = ops
+        self.setup = setup
+        self.items = items
+        self.memory_ops = memory_ops or min(ops, 100)   # ops of the tracemalloc and of the counted runs
+
+    def run(self, database, memory=True):
+        if self.setup is not None:
+            self.setup()
+        latencies = []
+        for i in range(self.ops):
+            start = time.perf_counter()
+            self.op(i)
+            latencies.append(time.perf_counter() - start)
+        i = self.ops
+        counter = Counter(database)
+        for i in range(i, i + self.memory_ops):
+            self.op(i)
+        database.set_trace_callback(None)
+        peak = None
+        if memory:
+            tracemalloc.start()
+            for i in range(i + 1, i + 1 + self.memory_ops):
+                self.op(i)
+            peak = tracemalloc.get_traced_memory()[1] / 1024
+            tracemalloc.stop()
+        latencies.sort()
+        total = sum(latencies)
+        return {
+            "benchmark": self.name,
+            "ops": self.ops,
+            "ops_per_sec": self.ops / total if total else None,
+            "rows_per_sec": self.ops * self.items / total if total else None,
+            "p50_ms": percentile(latencies, 0.5) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000,
+            "queries_per_op": counter.count / self.memory_ops,
+            "transactions_per_op": counter.transactions / self.memory_ops,
+            "peak_memory_kb": peak,
+        }
+
+
+def percentile(values, q):
+    # values are sorted
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def benchmarks(database, persons, dogs, rows, samples):
+    """
+    In order: the read-only ones first, the ones changing the tables last
+    """
+    state = {}
+    scratch = create_persons(database, "scratch")   # the bulk benchmarks insert there
+
+    def random_pk(i):
+        return random.randint(1, rows)
+
+    def fetch_dogs(i):
+        state["dogs"] = list(dogs.filter(id__lte=samples * 2))
+
+    def save(i):
+        entry = state["dogs"][i % len(state["dogs"])]
+        entry.age = (entry.age + 1) % 15
+        entry.save()
+
+    return [
+        Benchmark("bulk_create", lambda i: scratch.bulk_create((person(j) for j in range(rows)), batch_size=10000),
+                  1, items=rows, memory_ops=1),
+        Benchmark("bulk_create_multirow", lambda i: scratch.bulk_create((person(j) for j in range(rows)),
+                                                                        batch_size=10000, multirow=True),
+                  1, items=rows, memory_ops=1),
+        Benchmark("get", lambda i: persons.get(pk=random_pk(i)), samples),
+        Benchmark("get_dog_owner", lambda i: dogs.get(pk=random_pk(i)).owner, samples),
+        Benchmark("iterate", lambda i: list(persons.filter(id__lte=rows)), 3, items=rows, memory_ops=1),
+        Benchmark("iterate_fk", lambda i: [d.owner for d in dogs.all()], 3, items=rows, memory_ops=1),
+        Benchmark("iterate_select_related", lambda i: [d.owner for d in dogs.all().select_related("owner")], 3,
+                  items=rows, memory_ops=1),
+        Benchmark("iterate_prefetch_related", lambda i: [d.owner for d in dogs.all().prefetch_related("owner")],
+                  3, items=rows, memory_ops=1),
+        Benchmark("values_list", lambda i: list(persons.filter(id__lte=rows).values_list("name", "city")), 3,
+                  items=rows, memory_ops=1),
+        Benchmark("first", lambda i: dogs.filter(age=i % 15).first(), samples),
+        Benchmark("count", lambda i: dogs.filter(age=i % 15).count(), max(1, samples // 10)),
+        Benchmark("decode_date", lambda i: FieldTypes.date("2020-01-31"), samples * 10),
+        Benchmark("decode_datetime", lambda i: FieldTypes.datetime("2020-01-31 12:30:15.123456"), samples * 10),
+        Benchmark("create", lambda i: persons.create(**person(i)), samples),
+        Benchmark("create_no_returning", lambda i: persons.create(returning=False, **person(i)), samples),
+        Benchmark("save", save, samples, setup=lambda: fetch_dogs(0)),
+        Benchmark("update", lambda i: dogs.filter(id=random_pk(i)).update(age=i % 15), samples),
+        Benchmark("delete", lambda i: dogs.filter(id=rows - i).delete(), samples),
+    ]
+
+
+def run(kind, rows, samples, only=None, memory=True):
+    directory = None
+    if kind == "memory":
+        name = ":memory:"
+    else:
+        directory = tempfile.mkdtemp(prefix="sqliter-bench-")
+        name = os.path.join(directory, "bench.db")
+    database = Database(name)
+    try:
+        persons, dogs = create_schema(database)
+        persons.bulk_create((person(i) for i in range(rows)), batch_size=10000)
+        dogs.bulk_create((dog(i, rows) for i in range(rows)), batch_size=10000)
+        results = []
+        for benchmark in benchmarks(database, persons, dogs, rows, samples):
+            if only and benchmark.name not in only:
+                continue
+            result = benchmark.run(database, memory)
+            result.update(database=kind, rows=rows)
+            results.append(result)
+            print(f"{kind:>6} {rows:>8} {result['benchmark']:<26} {result['ops_per_sec']:>12.1f} ops/s "
+                  f"p50 {result['p50_ms']:>9.3f}ms p99 {result['p99_ms']:>9.3f}ms "
+                  f"{result['queries_per_op']:>6.2f} q/op {result['peak_memory_kb'] or 0:>10.1f}KB", file=sys.stderr)
+        return results
+    finally:
+        database.close()
+        if directory is not None:
+            shutil.rmtree(directory)
+
+
+def commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000], help="e.g. 10000 100000 1000000")
+    parser.add_argument("--databases", nargs="+", choices=["memory", "file"], default=["memory", "file"])
+    parser.add_argument("--samples", type=int, default=1000, help="ops of the single-row benchmarks")
+    parser.add_argument("--only", nargs="+", help="benchmarks names")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc runs")
+    parser.add_argument("--output", help="JSON file (default: stdout)")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    results = [result for kind in args.databases for rows in args.rows
+               for result in run(kind, rows, args.samples, args.only, not args.no_memory)]
+    report = {
+        "meta": {
+            "commit": commit(),
+            "date": datetime.datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "samples": args.samples,
+            "memory": not args.no_memory,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import collections
+import threading
+import time
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache holding up to size values, each expiring ttl seconds after being stored (if ttl)
+    """
+
+    def __init__(self, size=1024, ttl=None):
+        assert isinstance(size, int) and size > 0, "size param must be a positive int"
+        assert ttl is None or ttl > 0, "ttl param must be positive"
+        self.size = size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.__values = collections.OrderedDict()  # {key: (value, expiration)}
+        self.__lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.__lock:
+            if key in self.__values:
+                value, expiration = self.__values[key]
+                if expiration is None or expiration > time.monotonic():
+                    self.__values.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self.__values[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self.__lock:
+            expiration = time.monotonic() + self.ttl if self.ttl else None
+            self.__values[key] = value, expiration
+            self.__values.move_to_end(key)
+            if len(self.__values) > self.size:
+                self.__values.popitem(last=False)
+
+    def pop(self, key):
+        with self.__lock:
+            self.__values.pop(key, None)
+
+    def clear(self):
+        with self.__lock:
+            self.__values.clear()
+
+    def __len__(self):
+        return len(self.__values)
+
+    @property
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self), "max_size": self.size}
+
+
+class QueryCache(LRUCache):
+    """
+    LRUCache of query results, skipping the results longer than max_rows
+    """
+
+    def __init__(self, size=128, ttl=None, max_rows=10000):
+        super().__init__(size, ttl)
+        assert isinstance(max_rows, int) and max_rows > 0, "max_rows param must be a positive int"
+        self.max_rows = max_rows
+
+    def put(self, key, value):
+        if isinstance(value, list) and len(value) > self.max_rows:
+            return
+        super().put(key, value)
@@ -0,0 +1,28 @@
+import array
+
+try:
+    import numpy
+except ImportError:     # optional, see column
+    numpy = None
+
+
+# numpy dtypes and array typecodes of the column types, the other ones are kept as objects
+DTYPES = {"INTEGER": "int64", "REAL": "float64", "BOOLEAN": "bool", "DATE": "datetime64[D]",
+          "DATETIME": "datetime64[us]"}
+TYPECODES = {"INTEGER": "q", "REAL": "d", "BOOLEAN": "b"}
+
+
+def column(values, typename):
+    """
+    The values (a sequence, dates and datetimes decoded) of a column of type typename as a numpy array
+    if numpy is installed, otherwise as an array.array or, for TEXT, BLOB, DATE and DATETIME, as a list.
+    The numeric columns with NULLs become floats, with NaN in place of NULL (NaT for the dates)
+    """
+    if typename in TYPECODES and None in values:
+        values = [float("nan") if value is None else value for value in values]
+        typename = "REAL"
+    if numpy is not None:
+        return numpy.array(values, dtype=DTYPES.get(typename, object))
+    if typename in TYPECODES:
+        return array.array(TYPECODES[typename], values)
+    return list(values)
@@ -32,3 +32,7 @@ class MismatchingTypes(Exception):
 
 class UnknownOperation(Exception):
     pass
+
+
+class FullTableScan(Exception):
+    pass
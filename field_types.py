@@ -1,4 +1,5 @@
 import datetime
+import sqlite3
 
 from exceptions import ForeignKeyError
 
@@ -23,14 +24,12 @@ class FieldTypes:
 
     @staticmethod
     def date(value):
-        return datetime.datetime.strptime(value, "%Y-%m-%d").date()
+        return datetime.date.fromisoformat(value)
 
     @staticmethod
     def datetime(value):
-        try:
-            return datetime.datetime.strptime(value, "%Y-%m-%d %H:%M:%S.%f")
-        except ValueError:
-            return datetime.datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+        # YYYY-MM-DD HH:MM:SS[.ffffff], as written by the adapter (see register_converters)
+        return datetime.datetime.fromisoformat(value)
 
     @staticmethod
     def boolean(value):
@@ -47,6 +46,34 @@ FIELD_TYPE_ENFORCERS = {
     "BOOLEAN": FieldTypes.boolean,
 }
 
+# the decoders of the values read from the db, None if SQLite already returns the right type
+FIELD_TYPE_DECODERS = {
+    "TEXT": None,
+    "INTEGER": None,
+    "REAL": None,
+    "DATE": FieldTypes.date,
+    "DATETIME": FieldTypes.datetime,
+    "BLOB": None,
+    "BOOLEAN": FieldTypes.boolean,
+}
+
+# sqlite3 converters (of the raw bytes) of the types decoded by the connections opened with PARSE_DECLTYPES
+CONVERTERS = {
+    "DATE": lambda value: datetime.date.fromisoformat(value.decode()),
+    "DATETIME": lambda value: datetime.datetime.fromisoformat(value.decode()),
+    "BOOLEAN": lambda value: value != b"0",
+}
+
+
+def register_converters():
+    for typename, converter in CONVERTERS.items():
+        sqlite3.register_converter(typename, converter)
+
+
+# the same format as the default adapters of sqlite3, deprecated since python 3.12
+sqlite3.register_adapter(datetime.date, datetime.date.isoformat)
+sqlite3.register_adapter(datetime.datetime, lambda value: value.isoformat(" "))
+
 TYPE_MAP = {
     "TEXT": str,
     "INTEGER": int,
@@ -70,7 +97,7 @@ TYPE_MAP_REV = {
 
 class Field:
     def __init__(self, field_type, null=True, default=None, pk=False, autoincrement=True, unique=False,
-                 fk=False, **kwargs):
+                 index=False, fk=False, **kwargs):
         assert isinstance(null, bool), "null param must be of type bool"
         self.null = null
         self.default = default
@@ -80,6 +107,8 @@ class Field:
         self.autoincrement = autoincrement
         assert isinstance(unique, bool), "unique param must be of type bool"
         self.unique = unique
+        assert isinstance(index, bool), "index param must be of type bool"
+        self.index = index  # see Database.create_table
 
         if default is not None:
             assert isinstance(default, field_type), f"default value type ({type(default)}) " \
@@ -141,46 +170,46 @@ class Fields:
     SET_DEFAULT = "SET DEFAULT"
 
     class Text(Field):
-        def __init__(self, null=True, default=None, pk=False, autoincrement=True, unique=False):
-            super().__init__(str, null, default, pk, autoincrement, unique)
+        def __init__(self, null=True, default=None, pk=False, autoincrement=True, unique=False, index=False):
+            super().__init__(str, null, default, pk, autoincrement, unique, index)
             self.typename = "TEXT"
             self.type = str
 
     class Integer(Field):
-        def __init__(self, null=True, default=None, pk=False, autoincrement=True, unique=False):
-            super().__init__(int, null, default, pk, autoincrement, unique)
+        def __init__(self, null=True, default=None, pk=False, autoincrement=True, unique=False, index=False):
+            super().__init__(int, null, default, pk, autoincrement, unique, index)
             self.typename = "INTEGER"
             self.type = int
 
     class Real(Field):
-        def __init__(self, null=True, default=None, pk=False, autoincrement=True, unique=False):
-            super().__init__(float, null, default, pk, autoincrement, unique)
+        def __init__(self, null=True, default=None, pk=False, autoincrement=True, unique=False, index=False):
+            super().__init__(float, null, default, pk, autoincrement, unique, index)
             self.typename = "REAL"
             self.type = float
 
     class Blob(Field):
-        def __init__(self, null=True, default=None, pk=False, autoincrement=True, unique=False):
-            super().__init__(bytes, null, default, pk, autoincrement, unique)
+        def __init__(self, null=True, default=None, pk=False, autoincrement=True, unique=False, index=False):
+            super().__init__(bytes, null, default, pk, autoincrement, unique, index)
             self.typename = "BLOB"
             self.type = bytes
 
     class Date(Field):
-        def __init__(self, null=True, default=None, pk=False, autoincrement=True, unique=False):
-            super().__init__(type(datetime.datetime.now().date()), null, default, pk, autoincrement, unique)
+        def __init__(self, null=True, default=None, pk=False, autoincrement=True, unique=False, index=False):
+            super().__init__(type(datetime.datetime.now().date()), null, default, pk, autoincrement, unique, index)
             self.typename = "DATE"
             self.type = type(datetime.datetime.now().date())
 
     class DateTime(Field):
-        def __init__(self, null=True, default=None, pk=False, autoincrement=True, unique=False):
-            super().__init__(type(datetime.datetime.now()), null, default, pk, autoincrement, unique)
+        def __init__(self, null=True, default=None, pk=False, autoincrement=True, unique=False, index=False):
+            super().__init__(type(datetime.datetime.now()), null, default, pk, autoincrement, unique, index)
             self.typename = "DATETIME"
             self.type = type(datetime.datetime.now())
 
     class ForeignKey(Field):
         def __init__(self, references, on_delete, field_type=int,
-                     null=True, default=None, pk=False, autoincrement=True, unique=False):
+                     null=True, default=None, pk=False, autoincrement=True, unique=False, index=False):
 
-            super().__init__(field_type, null, default, pk, autoincrement, unique,
+            super().__init__(field_type, null, default, pk, autoincrement, unique, index,
                              fk=True, on_delete=on_delete, references=references)
 
             self.typename = TYPE_MAP_REV[field_type]
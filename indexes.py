@@ -0,0 +1,49 @@
+from utils import is_valid_field_name, scrub
+
+
+class Index:
+    """
+    An index on fields and/or SQL expressions, e.g. Index("owner", "-age"), Index("lower(name)"),
+    unique or partial (where: SQL condition, e.g. where="age > 5").
+    "-field" indexes the field in descending order.
+    N.B.: expressions and where conditions are inserted in the statement as they are
+    """
+
+    def __init__(self, *fields, name=None, unique=False, where=None):
+        assert len(fields) > 0, "You must provide at least a field"
+        assert all(isinstance(field, str) for field in fields), "fields must be strings"
+        assert name is None or (scrub(name) == name and is_valid_field_name(name)), f"Invalid index name: {name}"
+        assert isinstance(unique, bool), "unique param must be of type bool"
+        self.fields = fields
+        self.name = name
+        self.unique = unique
+        self.where = where
+
+    @staticmethod
+    def __is_column(field):
+        return scrub(field) == field
+
+    @property
+    def columns(self):
+        """
+        The fields names, expressions excluded
+        """
+        return [field.lstrip("-") for field in self.fields if self.__is_column(field.lstrip("-"))]
+
+    def name_for(self, table):
+        # e.g. dogs_owner_age_desc_idx for Index("owner", "-age")
+        fields = (f"{scrub(field)}_desc" if field.startswith("-") else scrub(field) for field in self.fields)
+        return self.name or f"{table}_{'_'.join(fields)}_idx"
+
+    def sql(self, table, condition=""):
+        """
+        The CREATE INDEX statement, condition: "" or "IF NOT EXISTS"
+        """
+        fields = ", ".join(f"{field[1:]} DESC" if field.startswith("-") and self.__is_column(field[1:]) else field
+                           for field in self.fields)
+        where = f"WHERE {self.where}" if self.where else ""
+        return f"CREATE {'UNIQUE ' if self.unique else ''}INDEX {condition} {self.name_for(table)} " \
+               f"ON {table} ({fields}) {where}"
+
+    def __repr__(self):
+        return f"<Index {self.sql('')} >"
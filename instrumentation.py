@@ -0,0 +1,192 @@
+import collections
+import logging
+import threading
+import time
+
+
+logger = logging.getLogger("sqliter")
+
+
+class Instrumentation:
+    """
+    Hooks, slow queries log and statistics of the statements executed through Database.execute.
+    before(sql, parameters) hooks are called before each statement and after(record) hooks after it, with
+    record = {"sql", "shape", "parameters", "duration", "rows", "affected", "error"}, where shape is
+    the normalized statement, parameters the number of parameters (None for executemany),
+    rows the number of rows returned, duration the time spent executing the statement and reading them
+    (see RecordedCursor) and affected the number of rows inserted, updated or deleted (None for the other statements)
+    """
+
+    BUCKETS = (0.0001, 0.001, 0.01, 0.1, 1, float("inf"))  # duration histogram upper bounds, in seconds
+
+    def __init__(self, slow_query_threshold=None):
+        self.slow_query_threshold = slow_query_threshold    # seconds, statements slower than it are logged
+        self.before = []
+        self.after = []
+        self.max_statements = None
+        self.__stats = collections.OrderedDict()   # {shape: stats}, see enable_stats
+        self.__lock = threading.Lock()
+
+    @property
+    def active(self):
+        return bool(self.before or self.after or self.max_statements or self.slow_query_threshold is not None)
+
+    def add_hook(self, before=None, after=None):
+        if before is not None:
+            self.before.append(before)
+        if after is not None:
+            self.after.append(after)
+
+    def remove_hook(self, before=None, after=None):
+        if before in self.before:
+            self.before.remove(before)
+        if after in self.after:
+            self.after.remove(after)
+
+    def enable_stats(self, max_statements=1000):
+        """
+        Collects the statistics of up to max_statements statement shapes (the oldest ones are forgotten)
+        """
+        assert isinstance(max_statements, int) and max_statements > 0, "max_statements param must be a positive int"
+        self.max_statements = max_statements
+
+    def disable_stats(self):
+        self.max_statements = None
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self.__lock:
+            self.__stats.clear()
+
+    @property
+    def stats(self):
+        """
+        {shape: {"count", "errors", "total", "max", "rows", "affected", "histogram": {upper bound: count}}}
+        """
+        with self.__lock:
+            return {shape: dict(stats, histogram=dict(stats["histogram"])) for shape, stats in self.__stats.items()}
+
+    def execute(self, connection, sql, parameters=(), many=False, fetch=None):
+        """
+        Returns as Database.execute. The cursors of the queries read later (fetch None) are wrapped
+        by a RecordedCursor, completing the record once read or closed
+        """
+        for hook in self.before:
+            hook(sql, parameters)
+        record = {"sql": sql, "shape": " ".join(sql.split()),
+                  "parameters": None if many else len(parameters), "rows": None, "affected": None, "error": None}
+        start = time.perf_counter()
+        try:
+            result = cursor = connection.executemany(sql, parameters) if many else connection.execute(sql, parameters)
+            if fetch is not None:
+                result = cursor.fetchone() if fetch == "one" else cursor.fetchall()
+                record["rows"] = int(result is not None) if fetch == "one" else len(result)
+            if cursor.rowcount >= 0:
+                record["affected"] = cursor.rowcount
+            if fetch is None and cursor.description is not None:    # rows still to be read
+                return RecordedCursor(cursor, record, time.perf_counter() - start, self._complete)
+        except Exception as error:
+            record["error"] = error
+            record["duration"] = time.perf_counter() - start
+            self._complete(record)
+            raise
+        record["duration"] = time.perf_counter() - start
+        self._complete(record)
+        return result
+
+    def _complete(self, record):
+        self.__record(record)
+        for hook in self.after:
+            hook(record)
+
+    def __record(self, record):
+        if self.slow_query_threshold is not None and record["duration"] >= self.slow_query_threshold:
+            logger.warning(f"Slow query ({record['duration']:.3f}s): {record['shape']}")
+        if not self.max_statements:
+            return
+        with self.__lock:
+            stats = self.__stats.get(record["shape"])
+            if stats is None:
+                if len(self.__stats) >= self.max_statements:
+                    self.__stats.popitem(last=False)
+                stats = self.__stats[record["shape"]] = {
+                    "count": 0, "errors": 0, "total": 0.0, "max": 0.0, "rows": 0, "affected": 0,
+                    "histogram": dict.fromkeys(self.BUCKETS, 0),
+                }
+            stats["count"] += 1
+            stats["errors"] += record["error"] is not None
+            stats["total"] += record["duration"]
+            stats["max"] = max(stats["max"], record["duration"])
+            stats["rows"] += record["rows"] or 0
+            stats["affected"] += record["affected"] or 0
+            stats["histogram"][next(bound for bound in self.BUCKETS if record["duration"] <= bound)] += 1
+
+
+class RecordedCursor:
+    """
+    Wraps a cursor, counting the rows read and the time spent reading them:
+    the record is completed once the cursor is exhausted, closed or garbage collected
+    """
+
+    __BATCH_SIZE = 256  # rows fetched per step while iterating
+
+    def __init__(self, cursor, record, duration, complete):
+        self.__cursor = cursor
+        self.__record = record
+        self.__duration = duration
+        self.__rows = 0
+        self.__complete = complete
+
+    def __read(self, fetch, *args):
+        start = time.perf_counter()
+        try:
+            rows = fetch(*args)
+        except Exception as error:
+            self.__duration += time.perf_counter() - start
+            if self.__record is not None:
+                self.__record["error"] = error
+            self.__done()
+            raise
+        self.__duration += time.perf_counter() - start
+        return rows
+
+    def fetchone(self):
+        row = self.__read(self.__cursor.fetchone)
+        if row is None:
+            self.__done()
+        else:
+            self.__rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self.__read(self.__cursor.fetchmany, self.__cursor.arraysize if size is None else size)
+        self.__rows += len(rows)
+        if not rows:
+            self.__done()
+        return rows
+
+    def fetchall(self):
+        rows = self.__read(self.__cursor.fetchall)
+        self.__rows += len(rows)
+        self.__done()
+        return rows
+
+    def __iter__(self):
+        for rows in iter(lambda: self.fetchmany(self.__BATCH_SIZE), []):
+            yield from rows
+
+    def close(self):
+        self.__done()
+        self.__cursor.close()
+
+    def __done(self):
+        if self.__record is not None:
+            record, self.__record = self.__record, None
+            record["rows"], record["duration"] = self.__rows, self.__duration
+            self.__complete(record)
+
+    def __del__(self):
+        self.__done()
+
+    def __getattr__(self, name):
+        return getattr(self.__cursor, name)
@@ -0,0 +1,88 @@
+import contextlib
+import queue
+import threading
+
+
+class ConnectionPool:
+    """
+    A single writer connection, serialized by a lock, and a pool of read-only connections
+    checked out per thread (nested checkouts in the same thread share the same connection).
+    Without readers, or while the current thread is writing, reads go through the writer
+    """
+
+    def __init__(self, connect, readers=0):
+        assert isinstance(readers, int) and readers >= 0, "readers param must be a positive int"
+        self.connection = connect(readonly=False)
+        self.readers = readers
+        self.__lock = threading.RLock()
+        self.__readers = queue.LifoQueue()
+        self.__connections = [self.connection]
+        for _ in range(readers):
+            connection = connect(readonly=True)
+            self.__readers.put(connection)
+            self.__connections.append(connection)
+        self.__local = threading.local()
+
+    @contextlib.contextmanager
+    def reader(self):
+        local = self.__local
+        if not self.readers or getattr(local, "writing", 0):
+            yield self.connection   # this way, the current write is visible
+            return
+        if not getattr(local, "depth", 0):
+            local.reader = self.__readers.get()     # blocks until one is available
+        local.depth = getattr(local, "depth", 0) + 1
+        try:
+            yield local.reader
+        finally:
+            local.depth -= 1
+            if not local.depth:
+                self.__readers.put(local.reader)
+                local.reader = None
+
+    @contextlib.contextmanager
+    def writer(self):
+        """
+        Serializes the writes. The outermost checkout of the thread is the transaction,
+        committing on success and rolling back on errors: the nested ones are part of it
+        """
+        with self.__lock:
+            local = self.__local
+            if getattr(local, "writing", 0):
+                local.writing += 1
+                try:
+                    yield self.connection
+                finally:
+                    local.writing -= 1
+                return
+            local.writing, local.callbacks = 1, {}
+            try:
+                with self.connection:
+                    yield self.connection
+            finally:
+                local.writing = 0
+                callbacks, local.callbacks = local.callbacks, {}
+                for callback in callbacks.values():
+                    callback()
+
+    @property
+    def writing(self):
+        """
+        Whether the current thread is in a write transaction
+        """
+        return bool(getattr(self.__local, "writing", 0))
+
+    def after_transaction(self, key, callback):
+        """
+        Calls callback once the transaction of the current thread is over, once per key
+        """
+        assert self.writing, "Not in a write transaction"
+        self.__local.callbacks[key] = callback
+
+    @property
+    def connections(self):
+        return list(self.__connections)
+
+    def close(self):
+        for connection in self.__connections:
+            connection.close()
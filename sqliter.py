@@ -1,6 +1,14 @@
+import copy
+import csv
+import datetime
+import itertools
+import json
+import logging
 import sqlite3
 
 from exceptions import (
+    ForeignKeyError,
+    FullTableScan,
     InvalidFieldName,
     MismatchingTypes,
     NoSuchField,
@@ -9,41 +17,261 @@ from exceptions import (
     UnknownOperation,
 )
 
-from field_types import TYPE_MAP, FIELD_TYPE_ENFORCERS, Fields
-from utils import is_valid_field_name, clean_kwargs, scrub, types_match
+from aggregates import Aggregate, Avg, Count, Max, Min, Sum
+from cache import LRUCache, QueryCache
+from columns import column
+from field_types import (
+    CONVERTERS, TYPE_MAP, FIELD_TYPE_DECODERS, FIELD_TYPE_ENFORCERS, Field, Fields, register_converters,
+)
+from indexes import Index
+from instrumentation import Instrumentation
+from pool import ConnectionPool
+from utils import is_valid_field_name, clean_kwargs, chunks, scanned_table, scrub, types_match
+
 
+__all__ = ["Database", "Fields", "Index", "Avg", "Count", "Max", "Min", "Sum"]
 
-__all__ = ["Database", "Fields"]
+logger = logging.getLogger("sqliter")
 
 
 class Database:
 
-    def __init__(self, __db_name):
+    __DDL_KEYWORDS = ("CREATE", "DROP", "ALTER")
+
+    # applied in this order: page_size must be set before switching to WAL
+    __PRAGMAS = ("page_size", "journal_mode", "synchronous", "temp_store", "cache_size", "mmap_size", "busy_timeout")
+
+    PROFILES = {
+        "throughput": {
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "temp_store": "MEMORY",
+            "cache_size": -64000,       # negative: KiB, i.e. ~64MB
+            "mmap_size": 268435456,     # 256MB
+            "busy_timeout": 5000,       # ms
+        },
+        "durable": {
+            "journal_mode": "WAL",
+            "synchronous": "FULL",
+            "busy_timeout": 5000,
+        },
+        "readonly": {                   # N.B.: the database is also opened in read-only mode
+            "temp_store": "MEMORY",
+            "cache_size": -64000,
+            "mmap_size": 268435456,
+            "busy_timeout": 5000,
+        },
+    }
+
+    def __init__(self, __db_name, profile=None, readers=0, cached_statements=128, strict=None, scan_threshold=1000,
+                 slow_query_threshold=None, converters=False, **pragmas):
+        """
+        profile: one of Database.PROFILES, pragmas: overrides of its settings, e.g. synchronous="FULL"
+        readers: number of read-only connections, enables the thread-safe pooled mode (see ConnectionPool)
+        cached_statements: size of the prepared statements cache of each connection
+        and of the SQL statements cache of each table (see Table._statement)
+        strict: "log" or "raise" (FullTableScan) when a QuerySet scans without an index
+        a table with more than scan_threshold rows
+        slow_query_threshold: statements slower than it (in seconds) are logged, see Instrumentation
+        converters: the DATE, DATETIME and BOOLEAN columns are decoded by sqlite3 (PARSE_DECLTYPES)
+        instead of by sqliter, for the entries and the projections (values(), values_list(), .raw()...) alike
+        """
+        assert isinstance(cached_statements, int) and cached_statements > 0, \
+            "cached_statements param must be a positive int"
+        assert strict in (None, "log", "raise"), f"Unknown strict mode: {strict}"
+        assert profile is None or profile in self.PROFILES, f"Unknown profile: {profile}"
+        for pragma in pragmas:
+            assert pragma in self.__PRAGMAS, f"Unknown pragma: {pragma}"
+        if readers:
+            assert __db_name != ":memory:", "the pooled mode requires a database file"
+            pragmas.setdefault("journal_mode", "WAL")  # readers don't block the writer and vice versa
         self.db_name = __db_name
-        self.connection = sqlite3.connect(__db_name)
-        self.connection.row_factory = sqlite3.Row
+        self.profile = profile
+        self.readers = readers
+        self.cached_statements = cached_statements
+        self.strict = strict
+        self.scan_threshold = scan_threshold
+        self.instrumentation = Instrumentation(slow_query_threshold)
+        self.converters = converters
+        if converters:
+            register_converters()
+        self.__pragmas = dict(self.PROFILES.get(profile, {}), **pragmas)
+        self.pool = ConnectionPool(self.__connect, readers)
+        self.connection = self.pool.connection   # the writer
         self.cursor = self.connection.cursor()
-        with self.connection:
-            self.cursor.execute("PRAGMA FOREIGN_KEYS = ON")
+        self.__schema = {}  # {table_name: Table instance or None if not loaded yet}
+        self.__schema_version = None
+        self.cache_settings = {}  # {table_name: (size, ttl)}, see Table.enable_cache
+        self.query_cache_settings = {}  # {table_name: (size, ttl, max_rows)}, see Table.enable_query_cache
+        self.__data_version = None
+
+    def __connect(self, readonly=False):
+        # in the pooled mode, the connections are used by different threads, one at a time
+        options = dict(check_same_thread=not self.readers, cached_statements=self.cached_statements,
+                       detect_types=sqlite3.PARSE_DECLTYPES if self.converters else 0)
+        if readonly or self.profile == "readonly":
+            connection = sqlite3.connect(f"file:{self.db_name}?mode=ro", uri=True, **options)
+        else:
+            connection = sqlite3.connect(self.db_name, **options)
+        connection.row_factory = sqlite3.Row
+        with connection:
+            connection.execute("PRAGMA FOREIGN_KEYS = ON")
             # for some weird reason, this is needed
             # otherwise the foreign keys are not enforced
+        for pragma in self.__PRAGMAS:
+            if pragma in self.__pragmas and not (readonly and pragma in ("page_size", "journal_mode")):
+                value = self.__pragmas[pragma]
+                assert isinstance(value, int) or str(value).isalnum(), f"Invalid value for {pragma}: {value}"
+                connection.execute(f"PRAGMA {pragma} = {value}")
+        return connection
+
+    def execute(self, connection, sql, parameters=(), many=False, fetch=None):
+        """
+        The statements of Database, Table, Entry and QuerySet (but the internal PRAGMAs and EXPLAINs)
+        go through here: executes sql on connection (or cursor),
+        through executemany if many, returning the cursor or, if fetch is "one" or "all", the fetched row(s).
+        The statements are instrumented only if needed (see Instrumentation)
+        """
+        if self.instrumentation.active:
+            return self.instrumentation.execute(connection, sql, parameters, many, fetch)
+        cursor = connection.executemany(sql, parameters) if many else connection.execute(sql, parameters)
+        if fetch is None:
+            return cursor
+        return cursor.fetchone() if fetch == "one" else cursor.fetchall()
+
+    def set_trace_callback(self, callback):
+        """
+        Calls callback(sql) for every statement executed by SQLite, on all the connections (None to disable)
+        """
+        for connection in self.pool.connections:
+            connection.set_trace_callback(callback)
+
+    def set_progress_handler(self, handler, n):
+        """
+        Calls handler() every n SQLite virtual machine instructions, on all the connections (None to disable):
+        if it returns a true value, the running statement is aborted (sqlite3.OperationalError: interrupted)
+        """
+        for connection in self.pool.connections:
+            connection.set_progress_handler(handler, n)
+
+    def interrupt(self):
+        """
+        Aborts the statements running on all the connections, e.g. from another thread
+        """
+        for connection in self.pool.connections:
+            connection.interrupt()
+
+    def reader(self):
+        """
+        Context manager checking out a connection for reading
+        """
+        return self.pool.reader()
+
+    def writer(self):
+        """
+        Context manager checking out the connection for writing, in a transaction
+        """
+        return self.pool.writer()
+
+    def close(self):
+        self.pool.close()
+
+    @property
+    def settings(self):
+        """
+        The effective connection settings, as reported by SQLite
+        """
+        settings = {}
+        with self.writer() as connection:
+            for pragma in self.__PRAGMAS:
+                row = connection.execute(f"PRAGMA {pragma}").fetchone()
+                settings[pragma] = row[0] if row is not None else None  # e.g. no mmap_size for :memory:
+        return settings
 
     def raw(self, sql):
-        self.cursor.execute(sql)
-        return self.cursor.lastrowid
+        with self.writer() as connection:
+            cursor = self.execute(connection, sql)
+        for table in list(self.__schema.values()):  # anything may have changed
+            if table is not None:
+                table._changed(deleted=True)
+        if sql.lstrip().upper().startswith(self.__DDL_KEYWORDS):
+            self.invalidate_schema()
+        return cursor.lastrowid
+
+    @property
+    def max_variables(self):
+        try:
+            return self.connection.getlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER)
+        except AttributeError:  # Connection.getlimit is available since python 3.11
+            return 999  # SQLite's default before 3.32
+
+    @property
+    def schema_version(self):
+        with self.reader() as connection:
+            return connection.execute("PRAGMA schema_version").fetchone()[0]
+
+    def invalidate_schema(self, name=None, keep_tables=False):
+        """
+        Forgets the cached schema (or just the table name), it will be reloaded on the next access.
+        With keep_tables, the loaded tables are kept, e.g. after creating or dropping an index
+        """
+        if keep_tables:
+            pass
+        elif name is None:
+            self.__schema = {}
+        else:
+            self.__schema.pop(name, None)
+        self.__schema_version = None
+
+    def __load_schema(self):
+        schema_version = self.schema_version
+        if schema_version != self.__schema_version:
+            # after invalidate_schema the loaded tables are kept, otherwise the schema changed elsewhere
+            loaded = self.__schema if self.__schema_version is None else {}
+            sql = """SELECT name FROM sqlite_master WHERE type='table'"""
+            with self.reader() as connection:
+                self.__schema = {row["name"]: loaded.get(row["name"]) for row in connection.execute(sql)}
+            self.__schema_version = schema_version
+        return self.__schema
 
     @property
     def tables(self):
-        sql = """SELECT name FROM sqlite_master WHERE type='table'"""
-        return [row["name"] for row in self.cursor.execute(sql)]
+        return list(self.__load_schema())
 
     def table(self, name):
-        if name in self.tables:
-            return Table(self, name)
-        else:
+        schema = self.__load_schema()
+        if name not in schema:
             raise NoSuchTable(name)
+        if schema[name] is None:
+            schema[name] = Table(self, name)
+        return schema[name]
 
-    def __create_table(self, table_name, condition, **kwargs):
+    def check_data_version(self):
+        """
+        Invalidates the caches of all the tables if another connection, e.g. from another process,
+        changed the database since the last check (the writes of this Database invalidate them already)
+        """
+        if self.readers and sqlite3.threadsafety < 3:  # the writer can't be used by two threads at once
+            with self.writer() as connection:
+                data_version = connection.execute("PRAGMA data_version").fetchone()[0]
+        else:   # without the writer lock, not to wait for the current write
+            data_version = self.connection.execute("PRAGMA data_version").fetchone()[0]
+        if self.__data_version is not None and data_version != self.__data_version:
+            for table in list(self.__schema.values()):
+                if table is not None:
+                    table._changed(deleted=True)
+        self.__data_version = data_version
+
+    def referencing(self, name):
+        """
+        The loaded tables with foreign keys to the table name
+        """
+        return [table for table in self.__schema.values()
+                if table is not None and any(fk["table"] == name for fk in table.foreign_keys.values())]
+
+    def __create_table(self, table_name, condition, indexes, **kwargs):
+        if isinstance(indexes, Field):     # a column named indexes
+            kwargs["indexes"], indexes = indexes, ()
         table_name = scrub(table_name)
         fields = ", ".join(field.sql(key) for key, field in kwargs.items())
         create_statement = f"""
@@ -51,15 +279,34 @@ class Database:
         {fields}
         )
         """
-        with self.connection:
-            self.cursor.execute(create_statement)
-        return Table(self, table_name)
+        # primary keys and unique fields are already indexed
+        indexes = [Index(key) for key, field in kwargs.items() if field.index and not (field.pk or field.unique)] \
+            + list(indexes)
+        names = set()
+        for index in indexes:
+            assert isinstance(index, Index), f"indexes must be Index instances, not {type(index)}"
+            for column in index.columns:
+                if column not in kwargs:
+                    raise NoSuchField(column)
+            name = index.name_for(table_name)
+            assert name not in names, f"Duplicate index name: {name}, name one of the indexes"
+            names.add(name)
+        with self.writer() as connection:
+            self.execute(connection, create_statement)
+            for index in indexes:
+                self.execute(connection, index.sql(table_name, condition))
+        self.invalidate_schema(table_name)
+        return self.table(table_name)
 
-    def create_table(self, table_name, **kwargs):
-        return self.__create_table(table_name, "", **kwargs)
+    def create_table(self, table_name, indexes=(), **kwargs):
+        """
+        kwargs: {name: Field}, indexes: Index instances, besides the ones of the Fields with index=True
+        (a Field passed as indexes is a column named indexes)
+        """
+        return self.__create_table(table_name, "", indexes, **kwargs)
 
-    def create_table_if_not_exists(self, table_name, **kwargs):
-        return self.__create_table(table_name, "IF NOT EXISTS", **kwargs)
+    def create_table_if_not_exists(self, table_name, indexes=(), **kwargs):
+        return self.__create_table(table_name, "IF NOT EXISTS", indexes, **kwargs)
 
 
 class Table:
@@ -69,177 +316,606 @@ class Table:
     def __init__(self, __database, __name):
         self.database = __database
         self.connection = __database.connection
-        self.__cursor = self.connection.cursor()
         self.name = __name
         self.fields, self.pk = self.__get_fields()
         self.columns = list(self.fields.keys())
         self.foreign_keys = self.__get_foreign_keys()
+        self.__related = {}
+        self.__statements = {}  # {shape: SQL statement}, see _statement
+        self.entry_class = self.__entry_class()
+        self.cache = None
+        if self.name in self.database.cache_settings:
+            self.enable_cache(*self.database.cache_settings[self.name])
+        self.query_cache = None
+        if self.name in self.database.query_cache_settings:
+            self.enable_query_cache(*self.database.query_cache_settings[self.name])
 
     def all(self):
         return QuerySet(self)
 
-    def __create(self, condition, bulk=False, **kwargs):
+    def enable_cache(self, size=1024, ttl=None):
+        """
+        Caches up to size entries by primary key, for ttl seconds (if ttl):
+        get(pk=...) and the foreign keys pointing to this table return the same Entry until it changes
+        """
+        self.database.cache_settings[self.name] = size, ttl
+        self.cache = LRUCache(size, ttl)
+
+    def disable_cache(self):
+        self.database.cache_settings.pop(self.name, None)
+        self.cache = None
+
+    def enable_query_cache(self, size=128, ttl=None, max_rows=10000):
+        """
+        Caches the results of up to size queries (QuerySet iteration, first, count, exists, aggregate)
+        by SQL and parameters, for ttl seconds (if ttl), skipping the results longer than max_rows.
+        The cache is cleared by any write to this table or to the tables it references,
+        and by the writes of other connections (see Database.check_data_version).
+        N.B.: the cached results (entries, dicts) are shared by the queries hitting them, treat them as read-only
+        """
+        self.database.query_cache_settings[self.name] = size, ttl, max_rows
+        self.query_cache = QueryCache(size, ttl, max_rows)
+
+    def disable_query_cache(self):
+        self.database.query_cache_settings.pop(self.name, None)
+        self.query_cache = None
+
+    def _changed(self, pk=None, inserted=False, deleted=False):
+        """
+        Invalidates the caches after a write: the query results and the cached entries,
+        the pk one (default: all of them) or none if the rows were only inserted.
+        The query results of the tables referencing this one are invalidated too, since they may join it,
+        and so are their entries if rows were deleted, since the deletion may have cascaded.
+        Within a transaction, they are invalidated again once it's over: meanwhile, the other threads
+        may have cached what they read before the commit
+        """
+        self.__invalidate(pk, inserted, deleted)
+        if self.database.pool.writing:
+            self.database.pool.after_transaction((self.name, deleted), lambda: self.__invalidate(None, False, deleted))
+
+    def __invalidate(self, pk, inserted, deleted):
+        if self.cache is not None and not inserted:
+            if pk is not None:
+                self.cache.pop(pk)
+            else:
+                self.cache.clear()
+        if self.query_cache is not None:
+            self.query_cache.clear()
+        tables, seen = self.database.referencing(self.name), {self.name}
+        while tables:
+            table = tables.pop()
+            if table.query_cache is not None:
+                table.query_cache.clear()
+            if deleted and table.cache is not None:
+                table.cache.clear()
+            if table.name not in seen:
+                seen.add(table.name)
+                tables.extend(self.database.referencing(table.name))
+
+    def __create(self, condition, returning=True, upsert=None, **kwargs):
+        """
+        Returns the created Entry or, if not returning, just its primary key (or rowid).
+        upsert: (conflict, update) fields, see __upsert_clause
+        """
         # todo: auto-add pk if not provided
         kwargs = clean_kwargs(**kwargs)
         for k, v in kwargs.items():
             if isinstance(v, Entry):
                 kwargs[k] = v._pk
-        cols = ", ".join(kwargs.keys())
-        values = ", ".join(f":{kw}" for kw in kwargs.keys())
-        sql = f"""
+        sql = self._statement(("create", condition, tuple(kwargs), upsert), lambda: f"""
         INSERT {condition} INTO {self.name} (
-            {cols}
-        ) VALUES ({values})
-        """
-        if not bulk:
-            with self.connection:
-                self.__cursor.execute(sql, kwargs)
-                entry = self.get(rowid=self.__cursor.lastrowid)
-                return entry
+            {", ".join(kwargs.keys())}
+        ) VALUES ({", ".join(f":{kw}" for kw in kwargs.keys())})
+        {self.__upsert_clause(tuple(kwargs), upsert)}
+        """)
+        with self.database.writer() as connection:
+            # lastrowid is still the one of a previous insert if ignored, or if updated by an upsert
+            updatable = upsert is not None and self.pk not in kwargs
+            if not returning and updatable and sqlite3.sqlite_version_info >= (3, 35, 0):
+                row = self.database.execute(connection, f"{sql} RETURNING {self.pk}", kwargs, fetch="one")
+                result = row[0] if row is not None else None
+            elif not returning:
+                cursor = self.database.execute(connection, sql, kwargs)
+                result = kwargs.get(self.pk, cursor.lastrowid) if cursor.rowcount and not updatable else None
+            elif sqlite3.sqlite_version_info < (3, 35, 0):  # no RETURNING, read the entry back
+                cursor = self.database.execute(connection, sql, kwargs)
+                if not cursor.rowcount:
+                    result = None
+                elif upsert is not None and all(field in kwargs for field in upsert[0]):
+                    result = self.get(**{field: kwargs[field] for field in upsert[0]})
+                else:
+                    result = self.get(rowid=cursor.lastrowid)
+            else:
+                row = self.database.execute(connection, f"{sql} RETURNING *", kwargs, fetch="one")
+                result = self.entry_class._from_row(row) if row is not None else None  # None if ignored
+        if upsert is not None:  # the updated row is known only if the conflict is on the primary key
+            self._changed(kwargs.get(self.pk) if upsert[0] == (self.pk,) else None)
         else:
-            self.__cursor.execute(sql, kwargs)
+            self._changed(inserted=condition != "OR REPLACE", deleted=condition == "OR REPLACE")
+        return result
 
-    def create(self, **kwargs):
-        return self.__create(condition="", **kwargs)
+    def create(self, returning=True, **kwargs):
+        return self.__create("", returning, **kwargs)
 
-    def create_or_replace(self, **kwargs):
-        return self.__create(condition="OR REPLACE", **kwargs)
+    def create_or_replace(self, returning=True, **kwargs):
+        return self.__create("OR REPLACE", returning, **kwargs)
 
-    def create_or_ignore(self, **kwargs):
-        return self.__create(condition="OR IGNORE", **kwargs)
+    def create_or_ignore(self, returning=True, **kwargs):
+        return self.__create("OR IGNORE", returning, **kwargs)
 
-    def __bulk_create(self, condition, iterable):
+    def upsert(self, conflict, update=None, returning=True, **kwargs):
+        """
+        Creates the entry or, if it conflicts on the conflict fields (a UNIQUE or PRIMARY KEY constraint),
+        updates the existing row in place with the update fields (default: all the others given).
+        Unlike create_or_replace, the row is not deleted, so ON DELETE actions don't fire.
+        Returns the created or updated Entry (None if update is empty and the row exists)
+        or, if not returning, its primary key (on SQLite < 3.35, None unless the primary key is given)
+        """
+        return self.__create("", returning, upsert=self.__upsert(conflict, update), **kwargs)
+
+    def __upsert(self, conflict, update):
+        assert sqlite3.sqlite_version_info >= (3, 24, 0), "upserts require SQLite 3.24+ (ON CONFLICT DO UPDATE)"
+        assert isinstance(conflict, (list, tuple)) and conflict, "conflict must be a list or tuple of fields"
+        conflict = tuple(self.pk if field == "pk" else field for field in conflict)
+        update = None if update is None else tuple(update)
+        for field in conflict + (update or ()):
+            if field not in self.fields:
+                raise NoSuchField(field)
+        return conflict, update
+
+    @staticmethod
+    def __upsert_clause(columns, upsert):
+        if upsert is None:
+            return ""
+        conflict, update = upsert
+        if update is None:
+            update = [column for column in columns if column not in conflict]
+        if not update:
+            return f"ON CONFLICT ({', '.join(conflict)}) DO NOTHING"
+        values = ", ".join(f"{column}=excluded.{column}" for column in update)
+        return f"ON CONFLICT ({', '.join(conflict)}) DO UPDATE SET {values}"
+
+    def __bulk_create(self, condition, iterable, batch_size=None, multirow=False, return_pks=False, upsert=None):
+        """
+        Inserts the dicts grouping consecutive ones with the same keys in a single statement,
+        executed through executemany or, if multirow, as INSERT ... VALUES (...), (...).
+        With batch_size, a transaction is committed every batch_size dicts
+        """
         assert hasattr(iterable, '__iter__'), f"You must provide an iterable of dicts, not {type(iterable)}"
-        with self.connection:
-            for kwargs in iterable:
-                assert isinstance(kwargs, dict), f"You must provide an iterable of dicts, not of {type(kwargs)}"
-                self.__create(condition, bulk=True, **kwargs)
+        if return_pks:
+            assert sqlite3.sqlite_version_info >= (3, 35, 0), "return_pks requires SQLite 3.35+ (RETURNING)"
+            multirow = True
+        pks = []
+        batches = chunks(iterable, batch_size) if batch_size else [iterable]
+        for batch in batches:
+            with self.database.writer() as connection:
+                for columns, group in itertools.groupby(batch, key=self.__bulk_columns):
+                    values = (tuple(v._pk if isinstance(v, Entry) else v for v in kwargs.values()) for kwargs in group)
+                    pks.extend(self.__bulk_insert(connection, condition, columns, values, multirow, return_pks,
+                                                  upsert))
+            if upsert is not None:
+                self._changed()
+            else:
+                self._changed(inserted=condition != "OR REPLACE", deleted=condition == "OR REPLACE")
+        if return_pks:
+            return pks
+
+    @staticmethod
+    def __bulk_columns(kwargs):
+        assert isinstance(kwargs, dict), f"You must provide an iterable of dicts, not of {type(kwargs)}"
+        return tuple(kwargs)
+
+    def __bulk_insert(self, connection, condition, columns, values, multirow, return_pks, upsert):
+        """
+        Inserts the values (tuples, in columns order)
+        """
+        cols = ", ".join(scrub(column) for column in columns)
+        placeholders = f"({', '.join('?' for _ in columns)})"
+        on_conflict = self.__upsert_clause(columns, upsert)
+        if not multirow:
+            self.database.execute(connection, self._statement(("bulk_insert", condition, columns, upsert), lambda: (
+                f"INSERT {condition} INTO {self.name} ({cols}) VALUES {placeholders} {on_conflict}")),
+                values, many=True)
+            return []
+        pks = []
+        returning = f"RETURNING {self.pk}" if return_pks else ""
+        for rows in chunks(values, max(1, self.database.max_variables // len(columns))):
+            sql = self._statement(("bulk_insert", condition, columns, len(rows), return_pks, upsert), lambda: f"""
+            INSERT {condition} INTO {self.name} ({cols})
+            VALUES {", ".join(placeholders for _ in rows)} {on_conflict} {returning}
+            """)
+            inserted = self.database.execute(connection, sql, [value for row in rows for value in row],
+                                             fetch="all" if return_pks else None)
+            if return_pks:
+                pks.extend(row[0] for row in inserted)
+        return pks
+
+    def bulk_create(self, iterable, batch_size=None, multirow=False, return_pks=False):
+        return self.__bulk_create("", iterable, batch_size, multirow, return_pks)
+
+    def bulk_create_or_replace(self, iterable, batch_size=None, multirow=False, return_pks=False):
+        return self.__bulk_create("OR REPLACE", iterable, batch_size, multirow, return_pks)
+
+    def bulk_create_or_ignore(self, iterable, batch_size=None, multirow=False, return_pks=False):
+        return self.__bulk_create("OR IGNORE", iterable, batch_size, multirow, return_pks)
 
-    def bulk_create(self, iterable):
-        self.__bulk_create("", iterable)
+    def bulk_upsert(self, iterable, conflict, update=None, batch_size=None, multirow=False, return_pks=False):
+        """
+        upsert (see .upsert) of many dicts, as bulk_create does
+        """
+        return self.__bulk_create("", iterable, batch_size, multirow, return_pks, self.__upsert(conflict, update))
 
-    def bulk_create_or_replace(self, iterable):
-        self.__bulk_create("OR REPLACE", iterable)
+    def load_csv(self, path, batch_size=10000):
+        """
+        Streams the rows of the CSV file (with a header of column names) into the table,
+        converting the values to the fields types and committing every batch_size rows.
+        Empty values are NULL, BLOBs are hex strings (as written by export_csv).
+        Returns the number of inserted rows
+        """
+        with open(path, newline="") as file:
+            reader = csv.reader(file)
+            columns = tuple(next(reader, ()))
+            assert len(columns) > 0, f"{path} has no header"
+            for column_name in columns:
+                if column_name not in self.fields:
+                    raise NoSuchField(column_name)
+            parsers = [self.__csv_parser(column_name) for column_name in columns]
+            rows = (tuple(None if value == "" else parse(value) for parse, value in zip(parsers, row))
+                    for row in reader)
+            inserted = 0
+            for batch in chunks(rows, batch_size):
+                with self.database.writer() as connection:
+                    self.__bulk_insert(connection, "", columns, batch, False, False, None)
+                inserted += len(batch)
+                self._changed(inserted=True)
+        return inserted
 
-    def bulk_create_or_ignore(self, iterable):
-        self.__bulk_create("OR IGNORE", iterable)
+    def __csv_parser(self, column_name):
+        typename = self.fields[column_name]["typename"]
+        if typename == "BOOLEAN":
+            return lambda value: value.lower() in ("1", "true")
+        if typename == "BLOB":
+            return bytes.fromhex
+        if typename in ("DATE", "DATETIME"):  # validated, then stored as written by the adapters
+            return FIELD_TYPE_ENFORCERS[typename]
+        return self.fields[column_name]["enforce_type"]
+
+    def export_csv(self, path):
+        """
+        Streams the table into a CSV file, with a header of column names.
+        NULLs are written as empty values, BLOBs as hex strings. Returns the number of written rows
+        """
+        rows = self.all()._unchecked().values_list(*self.columns)
+        blobs = [i for i, column_name in enumerate(self.columns) if self.fields[column_name]["typename"] == "BLOB"]
+        if blobs:
+            rows = ([value.hex() if i in blobs and value is not None else value for i, value in enumerate(row)]
+                    for row in rows)
+        written = 0
+        with open(path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(self.columns)
+            for batch in chunks(rows, 10000):
+                writer.writerows(batch)
+                written += len(batch)
+        return written
+
+    def bulk_update(self, iterable, fields, batch_size=None):
+        """
+        Writes the fields of the entries (or dicts with the primary key, as pk or by name)
+        through a single UPDATE statement run by executemany, in a transaction every batch_size entries
+        (default: a single one). Returns the number of updated rows
+        """
+        assert hasattr(iterable, '__iter__'), f"You must provide an iterable of entries, not {type(iterable)}"
+        fields = tuple(fields)
+        assert len(fields) > 0, "You must provide the fields to update"
+        for field in fields:
+            if field not in self.fields:
+                raise NoSuchField(field)
+        sql = self._update_statement(fields)
+        updated = 0
+        for batch in chunks(iterable, batch_size) if batch_size else [iterable]:
+            batch = list(batch)
+            values = [self.__update_values(item, fields) for item in batch]
+            with self.database.writer() as connection:
+                updated += self.database.execute(connection, sql, values, many=True).rowcount
+            for item in batch:
+                if isinstance(item, Entry):
+                    item._saved(fields)
+            self._changed()
+        return updated
+
+    def __update_values(self, item, fields):
+        if isinstance(item, Entry):
+            values = {field: getattr(item, item._keys[field]) for field in fields}  # the raw values
+            values["__pk"] = item._pk
+        else:
+            assert isinstance(item, dict), f"You must provide entries or dicts, not {type(item)}"
+            values = {field: item[field]._pk if isinstance(item[field], Entry) else item[field] for field in fields}
+            values["__pk"] = item["pk"] if "pk" in item else item[self.pk]
+        for field in fields:
+            if values[field] is not None and not types_match(values[field], field, self.fields):
+                raise MismatchingTypes(f"{field}: expected {self.fields[field]['type']}, got {type(values[field])}")
+        return values
 
     def clear(self):
-        with self.connection:
-            self.__cursor.execute(f"DELETE FROM {self.name}")
+        with self.database.writer() as connection:
+            self.database.execute(connection, f"DELETE FROM {self.name}")
+        self._changed(deleted=True)
 
     def drop(self):
-        with self.connection:
-            self.__cursor.execute(f"DROP TABLE {self.name}")
+        with self.database.writer() as connection:
+            self.database.execute(connection, f"DROP TABLE {self.name}")
+        self.database.invalidate_schema(self.name)
 
     def filter(self, operator="AND", **kwargs):
         return QuerySet(self, operator=operator, **kwargs)
 
+    def create_index(self, *fields, name=None, unique=False, where=None, if_not_exists=False):
+        """
+        Creates an index on the fields and/or expressions (see Index), returning its name
+        """
+        index = Index(*fields, name=name, unique=unique, where=where)
+        for column in index.columns:
+            if column not in self.fields:
+                raise NoSuchField(column)
+        with self.database.writer() as connection:
+            self.database.execute(connection, index.sql(self.name, "IF NOT EXISTS" if if_not_exists else ""))
+        self.database.invalidate_schema(keep_tables=True)
+        return index.name_for(self.name)
+
+    def drop_index(self, name, if_exists=False):
+        assert scrub(name) == name, f"Invalid index name: {name}"
+        with self.database.writer() as connection:
+            self.database.execute(connection, f"DROP INDEX {'IF EXISTS' if if_exists else ''} {name}")
+        self.database.invalidate_schema(keep_tables=True)
+
+    @property
+    def indexes(self):
+        """
+        {name: {"columns": [...], "unique": bool, "partial": bool, "origin": "c" | "u" | "pk"}},
+        origin: created by CREATE INDEX, by a UNIQUE constraint or by the PRIMARY KEY.
+        The columns of the expressions are None
+        """
+        with self.database.reader() as connection:
+            indexes = {row["name"]: {"unique": bool(row["unique"]), "partial": bool(row["partial"]),
+                                     "origin": row["origin"]}
+                       for row in connection.execute(f"PRAGMA index_list({self.name})")}
+            for name, index in indexes.items():
+                index["columns"] = [row["name"] for row in connection.execute(f"PRAGMA index_info({name})")]
+        return indexes
+
     def get(self, **kwargs):
         assert len(kwargs) > 0, "You must provide **kwargs"
         kwargs = clean_kwargs(**kwargs)
         if "pk" in kwargs:
             kwargs[self.pk] = kwargs.pop("pk")
-        conditions = " AND ".join(f"{key}=:{key}" for key in kwargs)
-        sql = f"""
+        by_pk = self.cache is not None and list(kwargs) == [self.pk]
+        if by_pk:
+            entry = self.cache.get(kwargs[self.pk])
+            if entry is not None:
+                return entry
+        sql = self._statement(("get", tuple(kwargs)), lambda: f"""
             SELECT * FROM {self.name}
-            WHERE {conditions}
-            """
-        row = self.__cursor.execute(sql, kwargs).fetchone()
+            WHERE {" AND ".join(f"{key}=:{key}" for key in kwargs)}
+            """)
+        with self.database.reader() as connection:
+            row = self.database.execute(connection, sql, kwargs, fetch="one")
         if row is None:
             raise NoSuchEntry
-        entry = Entry(self, row[self.pk], **row)
+        entry = self.entry_class._from_row(row)
+        if by_pk:
+            self.cache.put(entry._pk, entry)
         return entry
 
+    def _statement(self, shape, build):
+        """
+        Returns the SQL statement of the given shape (a hashable key), calling build() only the first time:
+        the SQL text is built once and, being the same, hits the prepared statements cache of sqlite3
+        """
+        try:
+            return self.__statements[shape]
+        except KeyError:
+            if len(self.__statements) >= self.database.cached_statements:
+                self.__statements.pop(next(iter(self.__statements)), None)   # the oldest one
+            sql = self.__statements[shape] = build()
+            return sql
+
+    def _update_statement(self, columns):
+        return self._statement(("update", columns), lambda: "UPDATE {} SET {} WHERE {}=:__pk".format(
+            self.name, ", ".join(f"{column}=:{column}" for column in columns), self.pk))
+
+    def related(self, field):
+        """
+        Returns the Table referenced by the foreign key field, caching it
+        """
+        if field not in self.__related:
+            self.__related[field] = self.database.table(self.foreign_keys[field]["table"])
+        return self.__related[field]
+
     @property
     def __table_info(self):
-        return [dict(row)
-                for row in self.__cursor.execute(f"PRAGMA table_info({self.name})")]
+        with self.database.reader() as connection:
+            return [dict(row) for row in connection.execute(f"PRAGMA table_info({self.name})")]
 
     def __get_fields(self):
         fields = {pragma["name"]: pragma for pragma in self.__table_info}
         pk = None
         for name, pragma in fields.items():
             pragma["enforce_type"] = FIELD_TYPE_ENFORCERS[pragma["type"]]
+            pragma["typename"] = pragma["type"]
             pragma["type"] = TYPE_MAP[pragma["type"]]
             if pragma["pk"] == 1:
                 pk = name
         return fields, pk
 
+    def _decoder(self, column):
+        """
+        The decoder of the values of column read from the db, None if they need none
+        """
+        typename = self.fields[column]["typename"]
+        if column in self.foreign_keys or (self.database.converters and typename in CONVERTERS):
+            return None
+        return FIELD_TYPE_DECODERS[typename]
+
+    def __entry_class(self):
+        """
+        Generates the Entry subclass of this table, with a slot for each column
+        """
+        slots, attributes = [], {}
+        for column in self.columns:
+            if not is_valid_field_name(column):
+                raise InvalidFieldName(column)
+            if column in self.foreign_keys:
+                attributes[column] = Related(column, self.foreign_keys[column]["to"])
+                slots.extend((f"{column}__key", f"{column}__entry"))
+            else:
+                slots.append(column)
+        entry_class = type("Entry", (Entry,), dict(attributes, __slots__=tuple(slots), _table=self))
+        entry_class._keys = {column: f"{column}__key" if column in self.foreign_keys else column
+                             for column in self.columns}
+        entry_class._setters = tuple(getattr(entry_class, entry_class._keys[column]).__set__
+                                     for column in self.columns)
+        decoders = tuple(self._decoder(column) for column in self.columns)
+        entry_class._decoders = decoders if any(decoders) else None
+        entry_class._pk_index = self.columns.index(self.pk) if self.pk in self.columns else None
+        return entry_class
+
     def __get_foreign_keys(self):
-        return {row['from']: dict(row)
-                for row in self.__cursor.execute(f"PRAGMA foreign_key_list({self.name})")}
+        with self.database.reader() as connection:
+            return {row['from']: dict(row)
+                    for row in connection.execute(f"PRAGMA foreign_key_list({self.name})")}
+
+
+class Related:
+    """
+    Foreign key attribute of the Entry subclasses: holds the raw key
+    and fetches the referenced Entry on first access
+    """
+
+    def __init__(self, field, to):
+        self.field, self.to = field, to
+        self.key, self.entry = f"{field}__key", f"{field}__entry"
+
+    def __get__(self, entry, owner=None):
+        if entry is None:
+            return self
+        key = getattr(entry, self.key)
+        if key is None:
+            return None
+        related = getattr(entry, self.entry, None)
+        if related is None or related._pk != key:   # not resolved yet, or the key changed since
+            related = entry._table.related(self.field).get(**{self.to: key})
+            object.__setattr__(entry, self.entry, related)
+        return related
+
+    def __set__(self, entry, value):
+        if isinstance(value, Entry):
+            object.__setattr__(entry, self.entry, value)
+            value = value._pk
+        object.__setattr__(entry, self.key, value)
 
 
 class Entry:
+    """
+    Base of the Entry classes generated by each Table, see Table.entry_class
+    """
 
-    def __init__(self, __table, __pk, **kwargs):
-        self.__table = __table
-        self.__database = self.__table.database
-        self.__connection = self.__table.connection
-        self.__cursor = self.__connection.cursor()
-        self._pk = __pk
-        self.__instanciate(**kwargs)
+    __slots__ = ("__loaded", "__dirty")
 
-    def __instanciate(self, **kwargs):
-        foreign_keys = self.__table.foreign_keys
-        for key, value in kwargs.items():
-            if not is_valid_field_name(key):
-                raise InvalidFieldName(key)
-            if key in foreign_keys:
-                table, to = foreign_keys[key]["table"], foreign_keys[key]["to"]
-                if isinstance(value, Entry):
-                    value = value._pk
-                value = self.__database.table(table).get(**{to: value})
-                setattr(self, key, value)
-            else:
-                setattr(self, key, self.__table.fields[key]["enforce_type"](value))
+    _table = None       # the following are set on the generated subclasses
+    _keys = {}          # {field: slot holding its raw value}
+    _setters = ()       # slots setters, in columns order
+    _decoders = None    # values decoders in columns order (see Table._decoder), None if none is needed
+    _pk_index = None
+
+    @classmethod
+    def _from_row(cls, row, decode=True):
+        entry = cls.__new__(cls)
+        entry.__populate(row, decode)
+        return entry
+
+    def __populate(self, row, decode=True):
+        if decode and self._decoders is not None:
+            values = tuple(value if value is None or decoder is None else decoder(value)
+                           for decoder, value in zip(self._decoders, row))
+        else:
+            values = tuple(row)
+        for setter, value in zip(self._setters, values):
+            setter(self, value)
+        self.__loaded = values  # as last read from or written to the db
+        self.__dirty = None     # changed fields
+
+    @property
+    def _pk(self):
+        return self.__loaded[self._pk_index]
+
+    def _resolve(self, field, related):
+        object.__setattr__(self, f"{field}__entry", related)
+
+    def __setattr__(self, key, value):
+        super().__setattr__(key, value)
+        if key in self._table.fields:
+            if self.__dirty is None:
+                self.__dirty = set()
+            self.__dirty.add(key)
+
+    def __raw(self, key):
+        return getattr(self, self._keys[key])
 
     def __reload(self):
-        row = self.__cursor.execute(
-            f"""
-            SELECT * FROM {self.__table.name}
-            WHERE {self.__table.pk}=?
-            """, (self._pk,)
-        ).fetchone()
+        with self._table.database.reader() as connection:
+            row = self._table.database.execute(connection, self._table._statement(("reload",), lambda: f"""
+                SELECT * FROM {self._table.name}
+                WHERE {self._table.pk}=?
+                """), (self._pk,), fetch="one")
         if row is None:
-            raise NoSuchEntry(self.__table.name, self._pk)
-        self.__instanciate(**row)
+            raise NoSuchEntry(self._table.name, self._pk)
+        self.__populate(row)
 
     def save(self):
         """
-        Updates itself writing changes to the db
+        Updates itself writing to the db only the fields changed since loaded
         """
+        if not self.__dirty:
+            return
         kwargs = {}
-        for key in self.__table.fields:
-            if isinstance(self.__dict__[key], Entry):   # if a value it's another Entry object
-                kwargs[key] = self.__dict__[key]._pk    # we translate it to its primary key
-            else:
-                kwargs[key] = self.__dict__[key]        # else we write it as it is
-            if not types_match(kwargs[key], key, self.__table.fields):
-                raise MismatchingTypes(f"Received {type(kwargs[key])}, Expected {self.__table.fields[key]['type']}")
+        columns = self._table.columns
+        for key in self.__dirty:
+            value = self.__raw(key)     # Entry objects are translated to their primary key
+            if value == self.__loaded[columns.index(key)]:
+                continue
+            if not types_match(value, key, self._table.fields):
+                raise MismatchingTypes(f"Received {type(value)}, Expected {self._table.fields[key]['type']}")
+            kwargs[key] = value
+        if kwargs:
+            sql = self._table._update_statement(tuple(sorted(kwargs)))
+            with self._table.database.writer() as connection:
+                self._table.database.execute(connection, sql, dict(kwargs, __pk=self._pk))
+            self._table._changed(self._pk)
+            self._saved(kwargs)
+            if self._table.cache is not None:   # write-through
+                self._table.cache.put(self._pk, self)
+        self.__dirty = None
 
-        kwargs[self.__table.pk] = self._pk
-        values = ", ".join([f"{key}=:{key}" for key in kwargs if key != "{self.__table.pk}"])
-        sql = f"""
-            UPDATE {self.__table.name}
-            SET {values}
-            WHERE {self.__table.pk}=:{self.__table.pk}
-            """
-        with self.__connection:
-            self.__cursor.execute(sql, kwargs)
+    def _saved(self, fields):
+        """
+        Marks the fields as written to the db
+        """
+        self.__loaded = tuple(self.__raw(column) if column in fields else value
+                              for column, value in zip(self._table.columns, self.__loaded))
+        if self.__dirty:
+            self.__dirty.difference_update(fields)
 
     def delete(self):
-        with self.__connection:
-            self.__cursor.execute(
-                f"""
-                DELETE FROM {self.__table.name}
-                WHERE {self.__table.pk}=?
-                """, (self._pk,)
-            )
+        with self._table.database.writer() as connection:
+            self._table.database.execute(connection, self._table._statement(("delete",), lambda: f"""
+                DELETE FROM {self._table.name}
+                WHERE {self._table.pk}=?
+                """), (self._pk,))
+        self._table._changed(self._pk, deleted=True)
 
     def __repr__(self):
-        return f"<Entry {str({key: self.__dict__[key] for key in self.__table.columns})} >"
+        return f"<Entry {str({key: self.__raw(key) for key in self._table.columns})} >"
 
 
 class QuerySet:
@@ -254,7 +930,7 @@ class QuerySet:
         "ilike": lambda x: f"LIKE :__{x}",
         "contains": lambda x: f"LIKE :__{x}",
         "icontains": lambda x: f"LIKE :__{x}",
-        "in": lambda x: f"IN [:__{x}]",
+        "in": lambda x: f"IN (SELECT value FROM json_each(:__{x}))",  # the long lists, see __in
     }
 
     __VALUES_DICT = {
@@ -262,15 +938,30 @@ class QuerySet:
         "icontains": lambda x: f"%{x}%"
     }
 
+    __PREFETCH_CHUNK_SIZE = 500  # rows per IN (...) query, below SQLite's 999 variables limit
+    __IN_PLACEHOLDERS = 256     # longer __in lists are bound as a single JSON array
+
+    __MISSING = object()
+
     def __init__(self, __table, operator="AND", **kwargs):
         self.__table = __table
-        self.__connection = self.__table.connection
-        self.__cursor = self.__connection.cursor()
+        self.__database = self.__table.database
         assert operator.lower() in ("and", "or"), f"Unknown operator: {operator}"
         self.__operator = operator.upper()
         self.__query = {}
         self.__kwargs = {}
         self.__orderby = []
+        self.__select_related = []
+        self.__prefetch_related = []
+        self.__projection = None    # fields selected by values(), values_list() and tuples()
+        self.__projection_type = None
+        self.__coerce = False
+        self.__decode = True        # see trusted()
+        self.__checked = True       # see _unchecked()
+        self.__limit = None
+        self.__offset = None
+        self.__groupby = []
+        self.__annotations = {}     # {name: Aggregate}
 
         kwargs = clean_kwargs(**kwargs)
         for key, value in kwargs.items():
@@ -285,28 +976,230 @@ class QuerySet:
                 field = self.__table.pk
             if field not in self.__table.fields:
                 raise NoSuchField(field)
+            if query == "in":
+                self.__in(field, value)
+                continue
             if not types_match(value, field, self.__table.fields):
                 raise MismatchingTypes(f"{field}: expected {self.__table.fields[field]['type']}, got {type(value)}")
-            self.__query[field] = self.__QUERY_DICT[query]
+            self.__query[field] = query
             if isinstance(value, list) or isinstance(value, tuple):
                 value = ", ".join(str(x) for x in value)
             self.__kwargs[f"__{field}"] = self.__VALUES_DICT.get(query, lambda x: x)(value)
 
+    def __in(self, field, values):
+        """
+        Binds up to __IN_PLACEHOLDERS values through placeholders, as many as the next power of 2
+        (padding with the last value) to keep few statement shapes, and the longer lists
+        as a single JSON array, read through json_each
+        """
+        assert isinstance(values, (list, tuple, set, frozenset)), f"{field}__in requires a list, tuple or set"
+        values = list(values)
+        if values and not types_match(values, field, self.__table.fields):
+            raise MismatchingTypes(f"{field}: expected {self.__table.fields[field]['type']} values")
+        if len(values) <= self.__IN_PLACEHOLDERS:
+            size = 1 << (len(values) - 1).bit_length() if values else 0
+            values += values[-1:] * (size - len(values))
+            self.__query[field] = ("in", size)
+            self.__kwargs.update({f"__{field}__{i}": value for i, value in enumerate(values)})
+        else:
+            assert not isinstance(values[0], bytes), f"{field}__in supports up to {self.__IN_PLACEHOLDERS} blobs"
+            self.__query[field] = "in"
+            self.__kwargs[f"__{field}"] = json.dumps([self.__json_value(value) for value in values])
+
+    @staticmethod
+    def __json_value(value):
+        # as stored by the sqlite3 adapters
+        if isinstance(value, datetime.datetime):
+            return value.isoformat(" ")
+        if isinstance(value, datetime.date):
+            return value.isoformat()
+        return value
+
     def delete(self):
-        with self.__connection:
-            self.__cursor.execute(f"DELETE FROM {self.__table.name} {self.__condition_statement}", self.__kwargs)
+        assert not self.__sliced, "Cannot delete a sliced QuerySet"
+        sql = self.__check_scans(self.__delete_statement, self.__kwargs)
+        with self.__database.writer() as connection:
+            self.__database.execute(connection, sql, self.__kwargs)
+        self.__table._changed(deleted=True)
 
     def order_by(self, field: str):
         order = "ASC"
         if field.startswith("-"):
             order = "DESC"
         field = field.replace("-", "")
-        if field not in self.__table.fields:
+        if field not in self.__table.fields and field not in self.__annotations:
             raise NoSuchField(field)
         self.__orderby.append((field, order))
         return self
 
+    def select_related(self, *fields):
+        """
+        Loads the entries referenced by the foreign keys fields in the same query, through a JOIN
+        """
+        for field in fields:
+            if field not in self.__table.foreign_keys:
+                raise ForeignKeyError(field)
+            self.__select_related.append(field)
+        return self
+
+    def prefetch_related(self, *fields):
+        """
+        Loads the entries referenced by the foreign keys fields with one IN (...) query per chunk of rows
+        """
+        for field in fields:
+            if field not in self.__table.foreign_keys:
+                raise ForeignKeyError(field)
+            self.__prefetch_related.append(field)
+        return self
+
+    def __project(self, fields, projection_type, coerce):
+        fields = [self.__table.pk if field == "pk" else field for field in fields] or self.__table.columns
+        for field in fields:
+            if field not in self.__table.fields:
+                raise NoSuchField(field)
+        self.__projection = fields
+        self.__projection_type = projection_type
+        self.__coerce = coerce
+        return self
+
+    def values(self, *fields, coerce=False):
+        """
+        Yields dicts of the given fields (default: all), straight from the cursor.
+        With coerce, the values are converted to the fields types
+        """
+        return self.__project(fields, dict, coerce)
+
+    def values_list(self, *fields, flat=False, coerce=False):
+        """
+        Yields tuples of the given fields (default: all) or, if flat, the value of the only given field
+        """
+        assert not flat or len(fields) == 1, "flat requires exactly one field"
+        return self.__project(fields, "flat" if flat else tuple, coerce)
+
+    def tuples(self):
+        """
+        Yields the raw tuples of all the fields
+        """
+        return self.__project((), tuple, False)
+
+    def to_columns(self, fields=(), chunk_size=10000):
+        """
+        Yields a {field: column} dict per chunk_size rows of the given fields (default: all),
+        fetched straight from the cursor, without building entries. The columns are numpy arrays
+        if numpy is installed, otherwise array.array or lists (see columns.column).
+        The dates and datetimes are decoded, unless trusted()
+        """
+        assert not self.__annotations, "to_columns() does not support annotated QuerySets"
+        fields = [self.__table.pk if field == "pk" else field for field in fields] or self.__table.columns
+        for field in fields:
+            if field not in self.__table.fields:
+                raise NoSuchField(field)
+        return self.__columns(fields, chunk_size)
+
+    def __columns(self, fields, chunk_size):
+        typenames = [self.__table.fields[field]["typename"] for field in fields]
+        decoders = [self.__table._decoder(field) if self.__decode and typename in ("DATE", "DATETIME") else None
+                    for field, typename in zip(fields, typenames)]
+        sql = self.__select(projection=fields)
+        if self.__query or self.__sliced:   # exporting the whole table scans it by intent
+            self.__check_scans(sql, self.__kwargs)
+        with self.__database.reader() as connection:    # checked out for the whole iteration
+            cursor = self.__projection_cursor(connection, sql, self.__kwargs)
+            for rows in iter(lambda: cursor.fetchmany(chunk_size), []):
+                yield {field: column(values if decode is None else
+                                     [value if value is None else decode(value) for value in values], typename)
+                       for field, typename, decode, values in zip(fields, typenames, decoders, zip(*rows))}
+
+    def _unchecked(self):
+        """
+        Skips the strict mode checks (see __check_scans): for the intended full scans, e.g. exporting a table
+        """
+        self.__checked = False
+        return self
+
+    def trusted(self):
+        """
+        Builds the entries without decoding the values read from the db (e.g. the dates stay ISO strings):
+        for the trusted reads, where the raw values are fine
+        """
+        self.__decode = False
+        return self
+
+    def __check_aggregates(self, aggregates):
+        """
+        Returns the aggregates, copying the ones on "pk" to set the primary key field
+        """
+        checked = {}
+        for name, aggregate in aggregates.items():
+            if not is_valid_field_name(name) or scrub(name) != name:
+                raise InvalidFieldName(name)
+            assert isinstance(aggregate, Aggregate), f"{name} must be an aggregate, not {type(aggregate)}"
+            if aggregate.field == "pk":
+                aggregate = copy.copy(aggregate)
+                aggregate.field = self.__table.pk
+            if aggregate.field is not None and aggregate.field not in self.__table.fields:
+                raise NoSuchField(aggregate.field)
+            checked[name] = aggregate
+        return checked
+
+    def aggregate(self, **aggregates):
+        """
+        Computes the aggregates (Count, Sum, Avg, Min, Max) in SQLite, returning a dict
+        e.g.: .aggregate(total=Sum("age"), n=Count())
+        """
+        aggregates = self.__check_aggregates(aggregates)
+        sql = self.__statement(("aggregate", self.__aggregates_shape(aggregates)),
+                               lambda: self.__aggregate_statement(aggregates))
+        return self.__cached(sql, lambda: self.__fetchone(sql, dict))
+
+    def __aggregate_statement(self, aggregates):
+        table = self.__table.name
+        columns = ", ".join(f"{aggregate.sql(table)} AS {name}" for name, aggregate in aggregates.items())
+        if self.__sliced:
+            return f"SELECT {columns} FROM ({self.__select(projection=self.__table.columns)}) AS {table}"
+        return f"SELECT {columns} FROM {table} {self.__condition_statement}"
+
+    def group_by(self, *fields):
+        for field in fields:
+            if field == "pk":
+                field = self.__table.pk
+            if field not in self.__table.fields:
+                raise NoSuchField(field)
+            self.__groupby.append(field)
+        if self.__annotations:  # annotated first, the group_by fields are part of the projection
+            self.__projection = list(self.__groupby)
+        return self
+
+    def annotate(self, **aggregates):
+        """
+        Yields a dict per group (see group_by) with the group_by fields and the given aggregates
+        e.g.: .group_by("owner").annotate(n=Count(), oldest=Max("age"))
+        """
+        self.__annotations.update(self.__check_aggregates(aggregates))
+        self.__projection = list(self.__groupby)
+        self.__projection_type = dict
+        return self
+
+    def __projected(self, cursor):
+        rows = cursor
+        if self.__coerce:
+            decoders = [self.__table._decoder(field) for field in self.__projection] + [None for _ in self.__annotations]
+            rows = (tuple(value if value is None or decode is None else decode(value)
+                          for decode, value in zip(decoders, row)) for row in rows)
+        if self.__projection_type == "flat":
+            return (row[0] for row in rows)
+        if self.__projection_type is dict:
+            keys = self.__projection + list(self.__annotations)
+            return (dict(zip(keys, row)) for row in rows)
+        return rows
+
+    def __projection_cursor(self, connection, sql, kwargs):
+        cursor = connection.cursor()
+        cursor.row_factory = None   # plain tuples
+        return self.__database.execute(cursor, sql, kwargs)
+
     def update(self, **kwargs):
+        assert not self.__sliced, "Cannot update a sliced QuerySet"
         for key, value in kwargs.items():
             if key not in self.__table.fields:
                 raise NoSuchField(key)
@@ -315,48 +1208,413 @@ class QuerySet:
             if not types_match(value, key, self.__table.fields):
                 raise MismatchingTypes(f"Received {type(value)}, Expected {self.__table.fields[key]['type']}")
 
-        values = ", ".join([f"{key}=:{key}" for key in kwargs if key != "self.__table.pk"])
-        sql = f"""
+        sql = self.__statement(("update", tuple(kwargs)), lambda: f"""
             UPDATE {self.__table.name}
-            SET {values}
+            SET {", ".join([f"{key}=:{key}" for key in kwargs if key != "self.__table.pk"])}
             {self.__condition_statement}
-            """
+            """)
         kwargs.update(**self.__kwargs)
-        with self.__connection:
-            self.__cursor.execute(sql, kwargs)
+        self.__check_scans(sql, kwargs)
+        with self.__database.writer() as connection:
+            self.__database.execute(connection, sql, kwargs)
+        self.__table._changed()
 
     def first(self):
-        row = self.__cursor.execute(self.__select_statement, self.__kwargs).fetchone()
-        if row is None:
-            return None
-        return Entry(self.__table, row[self.__table.pk], **row)
+        return self.__one(self.__offset)
+
+    def __one(self, offset):
+        sql = self.__select(limit=1, offset=offset)
+        kwargs = dict(self.__kwargs, **self.__limits(1, offset))
+        return self.__cached(sql, lambda: self.__fetch_first(sql, kwargs), kwargs)
+
+    def __fetch_first(self, sql, kwargs):
+        self.__check_scans(sql, kwargs)
+        with self.__database.reader() as connection:
+            if self.__projection is not None:
+                return next(self.__projected(self.__projection_cursor(connection, sql, kwargs)), None)
+            row = self.__database.execute(connection, sql, kwargs, fetch="one")
+            if row is None:
+                return None
+            return self.__entries([row])[0]
+
+    def exists(self):
+        sql = self.__statement(("exists",), lambda: f"""SELECT 1 FROM {self.__table.name}
+               {self.__condition_statement}
+               {self.__limit_statement(1)}
+               """)
+        kwargs = dict(self.__kwargs, **self.__limits(1))
+        return self.__cached(sql, lambda: self.__fetchone(sql, lambda row: row is not None, kwargs), kwargs)
+
+    def count(self):
+        sql = self.__statement(("count",), self.__count_statement)
+        return self.__cached(sql, lambda: self.__fetchone(sql, lambda row: row[0]))
+
+    def __count_statement(self):
+        if self.__annotations:
+            sql = f"SELECT COUNT(*) FROM ({self.__select_statement})"
+        elif not self.__sliced:
+            sql = f"SELECT COUNT(*) FROM {self.__table.name} {self.__condition_statement}"
+        else:
+            sql = f"""SELECT COUNT(*) FROM (
+                SELECT 1 FROM {self.__table.name} {self.__condition_statement} {self.__limit_statement()}
+            )"""
+        return sql
+
+    def __fetchone(self, sql, convert, kwargs=None):
+        kwargs = self.__kwargs if kwargs is None else kwargs
+        self.__check_scans(sql, kwargs)
+        with self.__database.reader() as connection:
+            return convert(self.__database.execute(connection, sql, kwargs, fetch="one"))
+
+    def __cached(self, sql, fetch, kwargs=None):
+        """
+        Returns the result of fetch(), from the table query cache if enabled.
+        kwargs: the parameters of sql, if not the QuerySet ones
+        """
+        cache = self.__table.query_cache
+        if cache is None:
+            return fetch()
+        key = self.__cache_key(sql, self.__kwargs if kwargs is None else kwargs)
+        result = cache.get(key, self.__MISSING)
+        if result is self.__MISSING:
+            result = fetch()
+            cache.put(key, result)
+        return result
+
+    def __cache_key(self, sql, kwargs):
+        self.__database.check_data_version()
+        # the same statement returns different results depending on the projection type, the decoding
+        # and the prefetched relations
+        return (sql, tuple(sorted(kwargs.items())), self.__projection_type, self.__coerce, self.__decode,
+                tuple(self.__prefetch_related))
+
+    def explain(self, statement="select"):
+        """
+        Runs EXPLAIN QUERY PLAN on the select (default), count, update or delete statement
+        and returns the plan nodes, e.g.: [{"id": 2, "detail": "SCAN dogs", "children": []}]
+        """
+        assert statement in ("select", "count", "update", "delete"), f"Unknown statement: {statement}"
+        if statement == "select":
+            sql = self.__select_statement
+        elif statement == "count":
+            sql = self.__statement(("count",), self.__count_statement)
+        elif statement == "update":    # the plan only depends on the conditions
+            sql = self.__statement(("update",), lambda: (
+                f"UPDATE {self.__table.name} SET {self.__table.pk}={self.__table.pk} {self.__condition_statement}"))
+        else:
+            sql = self.__delete_statement
+        return self.__plan(sql, self.__kwargs)
+
+    def __plan(self, sql, kwargs):
+        with self.__database.reader() as connection:
+            rows = connection.execute(f"EXPLAIN QUERY PLAN {sql}", kwargs).fetchall()
+        nodes = {0: {"children": []}}
+        for row in rows:    # the parents come first
+            nodes[row["id"]] = {"id": row["id"], "detail": row["detail"], "children": []}
+            nodes[row["parent"]]["children"].append(nodes[row["id"]])
+        return nodes[0]["children"]
+
+    def __check_scans(self, sql, kwargs):
+        """
+        In strict mode (see Database), logs or raises FullTableScan if the statement scans
+        without an index a table with more than Database.scan_threshold rows. Returns sql
+        """
+        database = self.__database
+        if database.strict is None or not self.__checked:
+            return sql
+        # the plans change with the indexes, hence with the schema version
+        scanned = self.__table._statement(("scans", sql, database.schema_version),
+                                          lambda: self.__scanned_tables(sql, kwargs))
+        for table in scanned:
+            with database.reader() as connection:
+                try:    # as many rows as the max rowid, at most
+                    rows = connection.execute(f"SELECT MAX(rowid) FROM {table}").fetchone()[0] or 0
+                except sqlite3.OperationalError:    # WITHOUT ROWID
+                    rows = connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            if rows > database.scan_threshold:
+                message = f"Full scan of {table} (~{rows} rows): {' '.join(sql.split())}"
+                if database.strict == "raise":
+                    raise FullTableScan(message)
+                logger.warning(message)
+        return sql
+
+    def __scanned_tables(self, sql, kwargs):
+        # the plan names the tables by alias, see __select
+        aliases = {self.__table.name: self.__table.name}
+        aliases.update({f"__{field}": self.__table.related(field).name for field in self.__select_related})
+        scanned, nodes = [], self.__plan(sql, kwargs)
+        while nodes:
+            node = nodes.pop()
+            table = scanned_table(node["detail"])
+            if table in aliases:
+                scanned.append(aliases[table])
+            nodes.extend(node["children"])
+        return tuple(scanned)
+
+    def __getitem__(self, key):
+        """
+        qs[start:stop] compiles to LIMIT/OFFSET and returns a new QuerySet, qs[index] returns the result
+        """
+        if isinstance(key, slice):
+            assert key.step is None, "Slicing with a step is not supported"
+            start, stop = key.start or 0, key.stop
+            assert start >= 0 and (stop is None or stop >= 0), "Negative indexing is not supported"
+            if self.__limit is not None:
+                stop = self.__limit if stop is None else min(stop, self.__limit)
+            sliced = self.__clone()
+            sliced.__offset = (self.__offset or 0) + start
+            sliced.__limit = None if stop is None else max(stop - start, 0)
+            sliced.__kwargs.update(sliced.__limits())
+            return sliced
+        assert key >= 0, "Negative indexing is not supported"
+        if self.__limit is not None and key >= self.__limit:
+            raise IndexError(key)
+        result = self.__one((self.__offset or 0) + key)
+        if result is None:
+            raise IndexError(key)
+        return result
+
+    def __clone(self):
+        clone = copy.copy(self)
+        clone.__query, clone.__kwargs = dict(self.__query), dict(self.__kwargs)
+        clone.__orderby, clone.__groupby = list(self.__orderby), list(self.__groupby)
+        clone.__select_related, clone.__prefetch_related = list(self.__select_related), list(self.__prefetch_related)
+        clone.__projection = None if self.__projection is None else list(self.__projection)
+        clone.__annotations = dict(self.__annotations)
+        return clone
 
     @property
-    def __condition_statement(self):
+    def __sliced(self):
+        return self.__limit is not None or bool(self.__offset)
+
+    def iterator(self, chunk_size=1000):
+        """
+        Yields the results reading chunk_size rows per query. Chunks are paginated on the
+        ordering fields and the primary key (keyset pagination) instead of OFFSET,
+        so deep chunks cost as much as the first one. N.B.: NULLs in the ordering fields are not supported
+        """
+        assert not self.__annotations, "iterator() does not support annotated QuerySets"
+        table = self.__table
+        orderby = list(self.__orderby)
+        if table.pk not in [field for field, _ in orderby]:
+            orderby.append((table.pk, "ASC"))
+        keys = [field for field, _ in orderby]
+        projection = self.__projection
+        if projection is not None:
+            projection = projection + [key for key in keys if key not in projection]
+        kwargs = dict(self.__kwargs)
+        keyset = ""
+        limit, offset = self.__limit, self.__offset
+        while limit is None or limit > 0:
+            size = chunk_size if limit is None else min(chunk_size, limit)
+            conditions = " AND ".join(f"({condition})" for condition in (self.__conditions, keyset) if condition)
+            sql = self.__select(projection, conditions, orderby, size, offset)
+            kwargs.update(self.__limits(size, offset))
+            if not keyset:
+                self.__check_scans(sql, kwargs)     # the next chunks seek on the keyset
+            with self.__database.reader() as connection:   # checked out per chunk
+                if projection is None:
+                    rows = self.__database.execute(connection, sql, kwargs, fetch="all")
+                    results = self.__entries(rows)
+                    last = rows[-1] if rows else None
+                else:
+                    rows = self.__projection_cursor(connection, sql, kwargs).fetchall()
+                    results = list(self.__projected([row[:len(self.__projection)] for row in rows]))
+                    last = dict(zip(projection, rows[-1])) if rows else None
+            yield from results
+            if len(rows) < size:
+                return
+            if limit is not None:
+                limit -= len(rows)
+            offset = 0
+            kwargs.update({f"__keyset_{key}": last[key] for key in keys})
+            keyset = self.__table._statement(("keyset", tuple(orderby)), lambda: self.__keyset_conditions(orderby))
+
+    def __keyset_conditions(self, orderby):
+        # (a > :a) OR (a = :a AND b < :b) OR ... following each field ordering
         conditions = []
-        if self.__query:
-            for key, query in self.__query.items():
-                conditions.append(f"{key} {query(key)}")
-            conditions_statement = f" {self.__operator} ".join(conditions)
-            return f"WHERE {conditions_statement}"
+        for i, (field, order) in enumerate(orderby):
+            equals = [f"{self.__table.name}.{key} = :__keyset_{key}" for key, _ in orderby[:i]]
+            operator = ">" if order == "ASC" else "<"
+            conditions.append(" AND ".join(equals + [f"{self.__table.name}.{field} {operator} :__keyset_{field}"]))
+        return " OR ".join(f"({condition})" for condition in conditions)
+
+    @property
+    def __delete_statement(self):
+        return self.__statement(("delete",), lambda: f"DELETE FROM {self.__table.name} {self.__condition_statement}")
+
+    @property
+    def __shape(self):
+        """
+        Everything the SQL statements depend on, but the parameters values
+        """
+        return (self.__operator, tuple(self.__query.items()), tuple(self.__orderby), tuple(self.__select_related),
+                None if self.__projection is None else tuple(self.__projection), tuple(self.__groupby),
+                self.__aggregates_shape(self.__annotations), self.__sliced)
+
+    @staticmethod
+    def __aggregates_shape(aggregates):
+        return tuple((name, aggregate.function, aggregate.field, aggregate.distinct)
+                     for name, aggregate in aggregates.items())
+
+    def __statement(self, shape, build):
+        return self.__table._statement(("queryset", self.__shape) + shape, build)
+
+    @property
+    def __conditions(self):
+        return f" {self.__operator} ".join(f"{self.__table.name}.{key} {self.__condition(key, query)}"
+                                           for key, query in self.__query.items())
+
+    def __condition(self, field, query):
+        if isinstance(query, tuple):    # ("in", number of placeholders), see __in
+            return f"IN ({', '.join(f':__{field}__{i}' for i in range(query[1]))})"
+        return self.__QUERY_DICT[query](field)
+
+    @property
+    def __condition_statement(self):
+        conditions = self.__conditions
+        if conditions:
+            return f"WHERE {conditions}"
         else:
             return ""
 
-    @property
-    def __orderby_statement(self):
-        orderby_statements = ", ".join(f"{field} {order}" for field, order in self.__orderby)
+    def __orderby_statement(self, orderby=None):
+        orderby_statements = ", ".join(f"{field} {order}" if field in self.__annotations
+                                         else f"{self.__table.name}.{field} {order}"
+                                         for field, order in orderby or self.__orderby)
         if orderby_statements:
             return f"ORDER BY {orderby_statements}"
         else:
             return ""
 
+    @property
+    def __groupby_statement(self):
+        if self.__groupby:
+            return f"GROUP BY {', '.join(f'{self.__table.name}.{field}' for field in self.__groupby)}"
+        else:
+            return ""
+
+    def __limits(self, limit=None, offset=None):
+        """
+        The parameters of __limit_statement: {} if not limited.
+        limit can only narrow down the QuerySet limit, offset replaces the QuerySet offset
+        """
+        if self.__limit is not None:
+            limit = self.__limit if limit is None else min(limit, self.__limit)
+        offset = self.__offset if offset is None else offset
+        if limit is None and not offset:
+            return {}
+        return {"__limit": -1 if limit is None else int(limit), "__offset": int(offset or 0)}
+
+    def __limit_statement(self, limit=None, offset=None):
+        # bound, not to have a statement per page
+        return "LIMIT :__limit OFFSET :__offset" if self.__limits(limit, offset) else ""
+
     @property
     def __select_statement(self):
-        return f"""SELECT * FROM {self.__table.name}
-               {self.__condition_statement}
-               {self.__orderby_statement}
+        return self.__select()
+
+    def __select(self, projection=None, conditions=None, orderby=None, limit=None, offset=None):
+        """
+        The arguments override the QuerySet projection, conditions, ordering, limit and offset
+        """
+        shape = ("select", None if projection is None else tuple(projection), conditions,
+                 None if orderby is None else tuple(orderby), bool(self.__limits(limit, offset)))
+        return self.__statement(shape, lambda: self.__build_select(projection, conditions, orderby, limit, offset))
+
+    def __build_select(self, projection, conditions, orderby, limit, offset):
+        table = self.__table.name
+        projection = projection or self.__projection
+        joins = []
+        if projection is not None:
+            columns = [f"{table}.{field}" for field in projection]
+            columns.extend(f"{aggregate.sql(table)} AS {name}" for name, aggregate in self.__annotations.items())
+        else:
+            columns = [f"{table}.*"]
+            for field in self.__select_related:
+                related, alias = self.__table.related(field), f"__{field}"
+                columns.extend(f"{alias}.{column} AS {alias}__{column}" for column in related.columns)
+                joins.append(f"LEFT JOIN {related.name} AS {alias} "
+                             f"ON {alias}.{self.__table.foreign_keys[field]['to']} = {table}.{field}")
+        conditions = self.__conditions if conditions is None else conditions
+        return f"""SELECT {", ".join(columns)} FROM {table}
+               {" ".join(joins)}
+               {f"WHERE {conditions}" if conditions else ""}
+               {self.__groupby_statement}
+               {self.__orderby_statement(orderby)}
+               {self.__limit_statement(limit, offset)}
                """
 
+    def __entries(self, rows):
+        table = self.__table
+        from_row, decode = table.entry_class._from_row, self.__decode
+        if not self.__select_related:
+            entries = [from_row(row, decode) for row in rows]
+        else:
+            entries = []
+            for row in rows:
+                entry = from_row(row, decode)   # the table columns come first
+                for field in self.__select_related:
+                    related = table.related(field)
+                    values = [row[f"__{field}__{column}"] for column in related.columns]
+                    if values[related.entry_class._pk_index] is not None:
+                        entry._resolve(field, related.entry_class._from_row(values, decode))
+                entries.append(entry)
+        for field in self.__prefetch_related:
+            self.__prefetch(field, rows, entries)
+        return entries
+
+    def __prefetch(self, field, rows, entries):
+        related, to = self.__table.related(field), self.__table.foreign_keys[field]["to"]
+        keys = list({row[field] for row in rows if row[field] is not None})
+        if not keys:
+            return
+        placeholders = ", ".join("?" for _ in keys)
+        sql = f"SELECT * FROM {related.name} WHERE {to} IN ({placeholders})"
+        with self.__database.reader() as connection:
+            related_entries = {row[to]: related.entry_class._from_row(row, self.__decode)
+                               for row in self.__database.execute(connection, sql, keys, fetch="all")}
+        for row, entry in zip(rows, entries):
+            if row[field] in related_entries:
+                entry._resolve(field, related_entries[row[field]])
+
     def __iter__(self):
-        for row in self.__cursor.execute(self.__select_statement, self.__kwargs):
-            yield Entry(self.__table, row[self.__table.pk], **row)
+        cache = self.__table.query_cache
+        if cache is None:
+            yield from self.__iterate()
+            return
+        key = self.__cache_key(self.__select_statement, self.__kwargs)
+        results = cache.get(key, self.__MISSING)
+        if results is not self.__MISSING:
+            yield from results
+            return
+        # streamed, buffering the results until they are too many to be cached
+        results = []
+        for result in self.__iterate():
+            if results is not None:
+                results.append(result)
+                if len(results) > cache.max_rows:
+                    results = None
+            yield result
+        if results is not None:
+            cache.put(key, results)
+
+    def __iterate(self):
+        self.__check_scans(self.__select_statement, self.__kwargs)
+        with self.__database.reader() as connection:    # checked out for the whole iteration
+            if self.__projection is not None:
+                yield from self.__projected(self.__projection_cursor(connection, self.__select_statement,
+                                                                     self.__kwargs))
+                return
+            cursor = self.__database.execute(connection, self.__select_statement, self.__kwargs)
+            if not self.__prefetch_related and not self.__select_related:
+                from_row, decode = self.__table.entry_class._from_row, self.__decode
+                for row in cursor:
+                    yield from_row(row, decode)
+                return
+            if not self.__prefetch_related:
+                for row in cursor:
+                    yield from self.__entries([row])
+                return
+            for rows in iter(lambda: cursor.fetchmany(self.__PREFETCH_CHUNK_SIZE), []):
+                yield from self.__entries(rows)
@@ -0,0 +1,70 @@
+import datetime
+import os
+import sys
+
+import pytest
+
+# the modules of sqliter import each other by their top-level names
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqliter import Database, Fields  # noqa: E402
+
+
+@pytest.fixture
+def database():
+    database = Database(":memory:")
+    yield database
+    database.close()
+
+
+@pytest.fixture
+def persons(database):
+    """
+    The persons table of the README: Bob (1), Frank (2), Alice (3)
+    """
+    persons = database.create_table(
+        "persons",
+        id=Fields.Integer(pk=True),
+        name=Fields.Text(null=False, unique=True),
+        city=Fields.Text(null=False, default="London"),
+        birthday=Fields.Date(),
+    )
+    persons.bulk_create([
+        dict(name="Bob", city="London", birthday=datetime.date(1990, 10, 10)),
+        dict(name="Frank", city="Paris", birthday=datetime.date(1985, 6, 1)),
+        dict(name="Alice", city="London", birthday=datetime.date(1995, 4, 22)),
+    ])
+    return persons
+
+
+@pytest.fixture
+def dogs(database, persons):
+    """
+    The dogs table of the README: Max, Charlie and Bella of Bob, Lucy of Frank, Molly of nobody
+    """
+    dogs = database.create_table(
+        "dogs",
+        id=Fields.Integer(pk=True),
+        name=Fields.Text(null=False),
+        age=Fields.Integer(null=False),
+        owner=Fields.ForeignKey(persons, on_delete=Fields.CASCADE),
+    )
+    dogs.bulk_create([
+        dict(name="Max", age=3, owner=1),
+        dict(name="Charlie", age=5, owner=1),
+        dict(name="Bella", age=7, owner=1),
+        dict(name="Lucy", age=2, owner=2),
+        dict(name="Molly", age=9, owner=None),
+    ])
+    return dogs
+
+
+@pytest.fixture
+def selects(database):
+    """
+    The SELECT statements run by the database from now on
+    """
+    selects = []
+    database.set_trace_callback(lambda sql: selects.append(sql) if sql.lstrip().upper().startswith("SELECT") else None)
+    yield selects
+    database.set_trace_callback(None)
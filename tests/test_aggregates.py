@@ -0,0 +1,34 @@
+import pytest
+
+from sqliter import Avg, Count, Max, Min, Sum
+
+
+def test_aggregate(dogs):
+    assert dogs.all().aggregate(n=Count(), total=Sum("age"), youngest=Min("age"), oldest=Max("age")) == \
+        {"n": 5, "total": 26, "youngest": 2, "oldest": 9}
+    assert dogs.filter(age__gt=4).aggregate(average=Avg("age")) == {"average": 7.0}
+    assert dogs.all().aggregate(owners=Count("owner", distinct=True)) == {"owners": 2}
+    assert dogs.all().order_by("age")[:2].aggregate(total=Sum("age")) == {"total": 5}
+
+
+def test_count_distinct_requires_a_field():
+    with pytest.raises(AssertionError):
+        Count(distinct=True)
+
+
+def test_aggregates_on_pk_are_not_changed(dogs):
+    n = Count("pk")
+    assert dogs.all().aggregate(n=n) == {"n": 5}
+    assert n.field == "pk"
+
+
+def test_group_by_annotate(dogs):
+    groups = list(dogs.all().group_by("owner").annotate(n=Count(), oldest=Max("age")).order_by("-n"))
+    assert groups[0] == {"owner": 1, "n": 3, "oldest": 7}
+    assert sorted(group["n"] for group in groups) == [1, 1, 3]
+
+
+def test_annotate_then_group_by(dogs):
+    groups = list(dogs.all().annotate(n=Count()).group_by("owner").order_by("owner"))
+    assert groups == [{"owner": None, "n": 1}, {"owner": 1, "n": 3}, {"owner": 2, "n": 1}]
+    assert list(dogs.all().annotate(n=Count())) == [{"n": 5}]
@@ -0,0 +1,56 @@
+import asyncio
+
+from aio import AsyncDatabase
+from sqliter import Fields
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+async def make_dogs():
+    database = AsyncDatabase(":memory:", batch_size=2)
+    dogs = await database.create_table("dogs", id=Fields.Integer(pk=True), name=Fields.Text(null=False),
+                                       age=Fields.Integer(null=False))
+    await dogs.bulk_create([{"name": "Max", "age": 3}, {"name": "Charlie", "age": 5}, {"name": "Bella", "age": 7}])
+    return database, dogs
+
+
+def test_queries():
+    async def main():
+        database, dogs = await make_dogs()
+        assert await dogs.all().count() == 3
+        assert (await dogs.get(name="Bella")).age == 7
+        assert [dog.name async for dog in dogs.all().order_by("-age")] == ["Bella", "Charlie", "Max"]
+        assert [name async for name in dogs.filter(age__gt=3).values_list("name", flat=True)] == ["Charlie", "Bella"]
+        assert [dog.name async for dog in dogs.all().iterator(chunk_size=1)] == ["Max", "Charlie", "Bella"]
+        assert (await dogs.all().order_by("age")[1:].first()).name == "Charlie"
+        assert await dogs.filter(age=30).exists() is False
+        await database.close()
+    run(main())
+
+
+def test_writes():
+    async def main():
+        database, dogs = await make_dogs()
+        dog = await dogs.create(name="Lucy", age=2)
+        dog.age = 4
+        await database.save(dog)
+        assert (await dogs.get(name="Lucy")).age == 4
+        await dogs.filter(age__lt=5).update(age=1)
+        await database.delete(dog)
+        assert await dogs.all().count() == 3
+        await dogs.filter(age=1).delete()
+        assert [dog.name async for dog in dogs.all()] == ["Charlie", "Bella"]
+        await database.close()
+    run(main())
+
+
+def test_early_break_releases_the_connection():
+    async def main():
+        database, dogs = await make_dogs()
+        async for _ in dogs.all():
+            break
+        assert await dogs.all().count() == 3
+        await database.close()
+    run(main())
@@ -0,0 +1,20 @@
+import benchmark
+
+
+def test_statements_per_op():
+    results = {result["benchmark"]: result for result in benchmark.run("memory", 200, 5, memory=False)}
+    assert results["get"]["queries_per_op"] == 1
+    assert results["iterate_fk"]["queries_per_op"] == 201    # N+1
+    assert results["iterate_select_related"]["queries_per_op"] == 1
+    assert results["iterate_prefetch_related"]["queries_per_op"] == 2
+    assert results["bulk_create_multirow"]["queries_per_op"] == 1
+    # BEGIN and COMMIT are counted apart
+    assert results["create"]["queries_per_op"] == 1
+    assert results["create"]["transactions_per_op"] == 2
+    assert results["get"]["transactions_per_op"] == 0
+
+
+def test_only():
+    results = benchmark.run("memory", 50, 3, only=["count"], memory=True)
+    assert [result["benchmark"] for result in results] == ["count"]
+    assert results[0]["rows"] == 50 and results[0]["peak_memory_kb"] is not None
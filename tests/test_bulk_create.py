@@ -0,0 +1,45 @@
+import sqlite3
+
+import pytest
+
+from sqliter import Database, Fields
+
+
+@pytest.fixture
+def numbers():
+    database = Database(":memory:")
+    table = database.create_table("numbers", id=Fields.Integer(pk=True), n=Fields.Integer(unique=True),
+                                  name=Fields.Text())
+    yield table
+    database.close()
+
+
+def test_bulk_create(numbers):
+    numbers.bulk_create({"n": i} for i in range(1000))
+    assert numbers.all().count() == 1000
+
+
+@pytest.mark.parametrize("multirow", [False, True])
+def test_batches_and_groups(numbers, multirow):
+    # consecutive dicts with different keys are inserted by different statements
+    rows = [{"n": i} if i % 3 else {"n": i, "name": f"number {i}"} for i in range(2500)]
+    numbers.bulk_create(iter(rows), batch_size=1000, multirow=multirow)
+    assert numbers.all().count() == 2500
+    assert numbers.get(n=3).name == "number 3" and numbers.get(n=4).name is None
+
+
+def test_return_pks(numbers):
+    assert numbers.bulk_create(({"n": i} for i in range(2000)), return_pks=True) == list(range(1, 2001))
+
+
+def test_batches_are_committed(numbers):
+    with pytest.raises(sqlite3.IntegrityError):     # in the second batch
+        numbers.bulk_create(({"n": i % 1500} for i in range(2000)), batch_size=1000)
+    assert numbers.all().count() == 1000
+
+
+def test_or_ignore_and_or_replace(numbers):
+    numbers.bulk_create([{"n": 1, "name": "one"}, {"n": 2, "name": "two"}])
+    numbers.bulk_create_or_ignore([{"n": 1, "name": "uno"}, {"n": 3, "name": "three"}], multirow=True)
+    numbers.bulk_create_or_replace([{"n": 2, "name": "due"}])
+    assert {number.n: number.name for number in numbers.all()} == {1: "one", 2: "due", 3: "three"}
@@ -0,0 +1,48 @@
+import time
+
+import pytest
+
+from cache import LRUCache
+from exceptions import NoSuchEntry
+
+
+def test_identity(dogs, selects):
+    dogs.enable_cache()
+    max_ = dogs.get(pk=1)
+    assert dogs.get(pk=1) is max_
+    assert dogs.get(id=1) is max_
+    assert len(selects) == 1
+    assert dogs.cache.stats == {"hits": 2, "misses": 1, "size": 1, "max_size": 1024}
+    assert dogs.get(name="Max") is not max_     # not by pk
+
+
+def test_write_through(dogs):
+    dogs.enable_cache()
+    max_ = dogs.get(pk=1)
+    max_.age = 4
+    max_.save()
+    assert dogs.get(pk=1) is max_
+    dogs.filter(name="Max").update(age=6)
+    assert dogs.get(pk=1) is not max_
+    assert dogs.get(pk=1).age == 6
+
+
+def test_invalidation_on_delete(dogs, persons):
+    dogs.enable_cache()
+    persons.enable_cache()
+    assert dogs.get(pk=1).owner.name == "Bob"
+    persons.filter(name="Bob").delete()     # cascades
+    with pytest.raises(NoSuchEntry):
+        dogs.get(pk=1)
+
+
+def test_lru_eviction_and_ttl():
+    cache = LRUCache(2, ttl=0.05)
+    cache.put(1, "a")
+    cache.put(2, "b")
+    assert cache.get(1) == "a"
+    cache.put(3, "c")
+    assert cache.get(2) is None and cache.get(1) == "a" and cache.get(3) == "c"
+    time.sleep(0.06)
+    assert cache.get(1) is None
+    assert len(cache) == 1
@@ -0,0 +1,74 @@
+import array
+import asyncio
+import datetime
+
+import pytest
+
+from aio import AsyncDatabase
+from columns import numpy
+from exceptions import FullTableScan, NoSuchField
+from sqliter import Database, Fields
+
+
+def test_to_columns(dogs):
+    [columns] = dogs.filter(age__gt=4).to_columns(["name", "age", "owner"])
+    assert columns["name"] == ["Charlie", "Bella", "Molly"]
+    assert list(columns["age"]) == [5, 7, 9]
+    assert str(list(columns["owner"])) == "[1.0, 1.0, nan]"   # NULLs as NaN
+    chunks = list(dogs.all().to_columns(["id"], chunk_size=2))
+    assert [list(chunk["id"]) for chunk in chunks] == [[1, 2], [3, 4], [5]]
+    assert isinstance(chunks[0]["id"], array.array if numpy is None else numpy.ndarray)
+
+
+def test_to_columns_decodes_dates(persons):
+    persons.create(name="Nobody")
+    [columns] = persons.all().to_columns(["birthday"])
+    if numpy is None:
+        assert columns["birthday"] == [datetime.date(1990, 10, 10), datetime.date(1985, 6, 1),
+                                       datetime.date(1995, 4, 22), None]
+    else:
+        assert columns["birthday"].dtype == numpy.dtype("datetime64[D]")
+        assert columns["birthday"][0] == numpy.datetime64("1990-10-10") and numpy.isnat(columns["birthday"][3])
+    [columns] = persons.all().trusted().to_columns(["birthday"])
+    assert columns["birthday"][0] == "1990-10-10"
+
+
+def test_to_columns_validates_eagerly(dogs):
+    with pytest.raises(NoSuchField):
+        dogs.all().to_columns(["nope"])
+
+
+def test_csv_round_trip(tmp_path, persons):
+    path = str(tmp_path / "persons.csv")
+    persons.create(name="Nobody", birthday=None)
+    assert persons.export_csv(path) == 4
+    persons.clear()
+    assert persons.load_csv(path, batch_size=3) == 4
+    assert [(person.name, person.birthday) for person in persons.filter(id__gt=2)] == \
+        [("Alice", datetime.date(1995, 4, 22)), ("Nobody", None)]
+
+
+def test_whole_table_exports_are_not_strict(tmp_path):
+    database = Database(":memory:", strict="raise", scan_threshold=2)
+    dogs = database.create_table("dogs", id=Fields.Integer(pk=True), age=Fields.Integer())
+    dogs.bulk_create({"age": i} for i in range(5))
+    assert dogs.export_csv(str(tmp_path / "dogs.csv")) == 5
+    assert len(list(dogs.all().to_columns())) == 1
+    with pytest.raises(FullTableScan):
+        list(dogs.filter(age=1).to_columns())
+    database.close()
+
+
+def test_async_csv(tmp_path):
+    async def main():
+        database = AsyncDatabase(str(tmp_path / "test.db"))
+        await database.create_table("dogs", id=Fields.Integer(pk=True), name=Fields.Text())
+        dogs = await database.table("dogs")
+        await dogs.bulk_create([dict(name="Max"), dict(name="Bella")])
+        exported = await dogs.export_csv(str(tmp_path / "dogs.csv"))
+        await dogs.clear()
+        loaded = await dogs.load_csv(str(tmp_path / "dogs.csv"))
+        await database.close()
+        return exported, loaded
+
+    assert asyncio.run(main()) == (2, 2)
@@ -0,0 +1,22 @@
+import pytest
+
+from sqliter import Database, Fields
+
+
+@pytest.fixture
+def persons():
+    database = Database(":memory:")
+    table = database.create_table(
+        "persons",
+        id=Fields.Integer(pk=True),
+        name=Fields.Text(null=False, unique=True),
+    )
+    yield table
+    database.close()
+
+
+def test_create_or_ignore_returns_none_if_ignored(persons):
+    assert persons.create_or_ignore(returning=False, name="Tom") == 1
+    assert persons.create_or_ignore(returning=False, name="Bob") == 2
+    assert persons.create_or_ignore(returning=False, name="Tom") is None
+    assert persons.create_or_ignore(name="Tom") is None
@@ -0,0 +1,43 @@
+import datetime
+
+import pytest
+
+from sqliter import Database, Fields
+
+
+@pytest.fixture(params=[False, True], ids=["sqliter", "converters"])
+def events(request):
+    database = Database(":memory:", converters=request.param)
+    table = database.create_table("events", id=Fields.Integer(pk=True), day=Fields.Date(),
+                                  at=Fields.DateTime(), name=Fields.Text())
+    table.create(day=datetime.date(2020, 1, 31), at=datetime.datetime(2020, 1, 31, 12, 30, 5, 123), name="launch")
+    table.create(name="unknown")
+    yield table
+    database.close()
+
+
+def test_entries_are_decoded(events):
+    launch, unknown = events.all()
+    assert launch.day == datetime.date(2020, 1, 31)
+    assert launch.at == datetime.datetime(2020, 1, 31, 12, 30, 5, 123)
+    assert unknown.day is None and unknown.at is None
+    assert events.get(name="launch").day == datetime.date(2020, 1, 31)
+
+
+def test_projections(events):
+    rows = list(events.filter(name="launch").values_list("day", "at", coerce=True))
+    assert rows == [(datetime.date(2020, 1, 31), datetime.datetime(2020, 1, 31, 12, 30, 5, 123))]
+    raw = events.filter(name="launch").values_list("day", flat=True).first()
+    if events.database.converters:
+        assert raw == datetime.date(2020, 1, 31)
+    else:
+        assert raw == "2020-01-31"
+
+
+def test_trusted(events):
+    launch = events.filter(name="launch").trusted().first()
+    if events.database.converters:     # decoded by sqlite3 anyway
+        assert launch.day == datetime.date(2020, 1, 31)
+    else:
+        assert launch.day == "2020-01-31"
+        assert launch.at == "2020-01-31 12:30:05.000123"
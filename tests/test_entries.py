@@ -0,0 +1,45 @@
+import pytest
+
+
+@pytest.fixture
+def writes(database):
+    """
+    The UPDATE statements run from now on
+    """
+    writes = []
+    database.instrumentation.add_hook(
+        before=lambda sql, parameters: writes.append(" ".join(sql.split())) if sql.lstrip().startswith("UPDATE")
+        else None)
+    return writes
+
+
+def test_save_writes_only_the_changed_fields(dogs, writes):
+    max_ = dogs.get(name="Max")
+    max_.save()
+    assert writes == []
+    max_.age = 4
+    max_.save()
+    assert writes == ["UPDATE dogs SET age=:age WHERE id=:__pk"]
+    max_.save()
+    assert len(writes) == 1
+    max_.age = 4   # set, but unchanged
+    max_.name = "Maximus"
+    max_.save()
+    assert writes[1] == "UPDATE dogs SET name=:name WHERE id=:__pk"
+    assert (dogs.get(pk=1).name, dogs.get(pk=1).age) == ("Maximus", 4)
+
+
+def test_delete(dogs, persons):
+    persons.get(name="Bob").delete()
+    assert [dog.name for dog in dogs.all()] == ["Lucy", "Molly"]    # cascaded
+
+
+def test_entry_classes(dogs, persons):
+    max_ = dogs.get(name="Max")
+    assert type(max_) is dogs.entry_class
+    assert not hasattr(max_, "__dict__")
+    with pytest.raises(AttributeError):
+        max_.nope = 1
+    assert repr(max_) == "<Entry {'id': 1, 'name': 'Max', 'age': 3, 'owner': 1} >"
+    assert repr(persons.get(pk=1)) == \
+        "<Entry {'id': 1, 'name': 'Bob', 'city': 'London', 'birthday': datetime.date(1990, 10, 10)} >"
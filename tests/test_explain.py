@@ -0,0 +1,53 @@
+import pytest
+
+from exceptions import FullTableScan
+from sqliter import Database, Fields
+from utils import scanned_table
+
+
+@pytest.mark.parametrize("detail, table", [
+    ("SCAN dogs", "dogs"),
+    ("SCAN TABLE dogs", "dogs"),
+    ("SCAN TABLE persons AS __owner", "__owner"),
+    ("SCAN dogs USING INDEX dogs_age_idx", None),
+    ("SCAN TABLE dogs USING COVERING INDEX dogs_age_idx", None),
+    ("SEARCH dogs USING INTEGER PRIMARY KEY (rowid=?)", None),
+    ("USE TEMP B-TREE FOR ORDER BY", None),
+])
+def test_scanned_table(detail, table):
+    assert scanned_table(detail) == table
+
+
+def test_explain(dogs):
+    [node] = dogs.filter(age__gt=5).explain()
+    assert scanned_table(node["detail"]) == "dogs"
+    dogs.create_index("age")
+    [node] = dogs.filter(age__gt=5).explain("count")
+    assert "dogs_age_idx" in node["detail"]
+    assert "INTEGER PRIMARY KEY" in dogs.filter(id=1).explain("delete")[0]["detail"]
+
+
+@pytest.fixture
+def strict(request):
+    database = Database(":memory:", strict=request.param, scan_threshold=2)
+    dogs = database.create_table("dogs", id=Fields.Integer(pk=True), age=Fields.Integer())
+    dogs.bulk_create({"age": i} for i in range(5))
+    yield dogs
+    database.close()
+
+
+@pytest.mark.parametrize("strict", ["raise"], indirect=True)
+def test_strict_raise(strict):
+    with pytest.raises(FullTableScan):
+        list(strict.filter(age=1))
+    with pytest.raises(FullTableScan):
+        strict.filter(age=1)[1:].count()
+    assert strict.filter(id=1).first().age == 0
+    strict.create_index("age")
+    assert [dog.id for dog in strict.filter(age=1)] == [2]
+
+
+@pytest.mark.parametrize("strict", ["log"], indirect=True)
+def test_strict_log(strict, caplog):
+    assert strict.filter(age=1).count() == 1
+    assert "Full scan of dogs" in caplog.text
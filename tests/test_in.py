@@ -0,0 +1,41 @@
+import datetime
+
+import pytest
+
+from exceptions import MismatchingTypes
+
+
+def names(queryset):
+    return sorted(dog.name for dog in queryset)
+
+
+def test_short_lists(dogs):
+    assert names(dogs.filter(age__in=[3, 7])) == ["Bella", "Max"]
+    assert names(dogs.filter(age__in=(3, 5, 7))) == ["Bella", "Charlie", "Max"]   # padded to 4 placeholders
+    assert names(dogs.filter(name__in={"Lucy"})) == ["Lucy"]
+    assert names(dogs.filter(age__in=[])) == []
+    assert dogs.filter(age__in=[2, 9], name="Lucy").count() == 1
+
+
+def test_long_lists(dogs, persons):
+    ages = list(range(4, 1000))
+    assert names(dogs.filter(age__in=ages)) == ["Bella", "Charlie", "Molly"]
+    assert dogs.filter(name__in=[f"dog {i}" for i in range(500)] + ["Max"]).count() == 1
+    days = [datetime.date(1990, 1, 1) + datetime.timedelta(days=i) for i in range(400)]
+    assert [person.name for person in persons.filter(birthday__in=days)] == ["Bob"]
+
+
+def test_writes(dogs):
+    dogs.filter(age__in=[3, 5]).update(age=1)
+    assert names(dogs.filter(age=1)) == ["Charlie", "Max"]
+    dogs.filter(id__in=[1]).delete()
+    assert dogs.all().count() == 4
+    dogs.filter(id__in=list(range(1, 1001))).delete()
+    assert dogs.all().count() == 0
+
+
+def test_mismatching_types(dogs):
+    with pytest.raises(MismatchingTypes):
+        dogs.filter(age__in=["3"])
+    with pytest.raises(AssertionError):
+        dogs.filter(age__in=3)
@@ -0,0 +1,46 @@
+import pytest
+
+from exceptions import NoSuchField
+from sqliter import Fields, Index
+
+
+def test_create_table_indexes(database):
+    cats = database.create_table(
+        "cats",
+        id=Fields.Integer(pk=True),
+        name=Fields.Text(index=True),
+        age=Fields.Integer(),
+        indexes=[Index("name", "-age"), Index("lower(name)", name="cats_lower_name"), Index("age", where="age > 5")],
+    )
+    indexes = cats.indexes
+    assert indexes["cats_name_idx"]["columns"] == ["name"]
+    assert indexes["cats_name_age_desc_idx"]["columns"] == ["name", "age"]
+    assert indexes["cats_lower_name"]["columns"] == [None]
+    assert indexes["cats_age_idx"]["partial"]
+    database.create_table_if_not_exists("cats", id=Fields.Integer(pk=True), name=Fields.Text(index=True),
+                                        age=Fields.Integer(), indexes=[Index("name", "-age")])
+    assert set(database.table("cats").indexes) == set(indexes)
+
+
+def test_create_and_drop_index(dogs):
+    name = dogs.create_index("age")
+    assert name == "dogs_age_idx"
+    assert dogs.create_index("-age") == "dogs_age_desc_idx"
+    assert dogs.create_index("age", if_not_exists=True) == name
+    dogs.create_index("name", "age", unique=True, name="dogs_name_age")
+    assert dogs.indexes["dogs_name_age"] == {"unique": True, "partial": False, "origin": "c", "columns": ["name", "age"]}
+    dogs.drop_index(name)
+    assert name not in dogs.indexes
+    with pytest.raises(NoSuchField):
+        dogs.create_index("nope")
+
+
+def test_duplicate_index_names(database):
+    with pytest.raises(AssertionError):
+        database.create_table("cats", id=Fields.Integer(pk=True), age=Fields.Integer(),
+                              indexes=[Index("age"), Index("age", unique=True)])
+
+
+def test_column_named_indexes(database):
+    table = database.create_table("users", id=Fields.Integer(pk=True), indexes=Fields.Text())
+    assert table.create(indexes="a").indexes == "a"
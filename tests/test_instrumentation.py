@@ -0,0 +1,53 @@
+import logging
+
+from sqliter import Database
+
+
+def test_hooks(dogs):
+    instrumentation = dogs.database.instrumentation
+    before, after = [], []
+    instrumentation.add_hook(before=lambda sql, parameters: before.append(sql), after=after.append)
+    dogs.get(pk=1)
+    dogs.filter(age__gt=4).update(age=1)
+    instrumentation.remove_hook(after=after.append)
+    dogs.all().count()
+    assert len(before) == 3 and len(after) == 2
+    assert after[0]["rows"] == 1 and after[0]["parameters"] == 1
+    assert after[1]["affected"] == 3 and after[1]["rows"] is None
+
+
+def test_records_of_the_cursors_read_later(dogs):
+    records = []
+    dogs.database.instrumentation.add_hook(after=records.append)
+    assert len(list(dogs.all())) == 5
+    assert len(list(dogs.all().values_list("name"))) == 5
+    assert list(dogs.all().select_related("owner").prefetch_related("owner"))
+    iterator = iter(dogs.all())
+    next(iterator)
+    iterator.close()
+    # the prefetch query is read before its QuerySet one, the rows are read in batches
+    assert [record["rows"] for record in records] == [5, 5, 2, 5, 5]
+    assert all(record["duration"] > 0 and record["error"] is None for record in records)
+
+
+def test_stats(dogs):
+    instrumentation = dogs.database.instrumentation
+    instrumentation.enable_stats()
+    for pk in (1, 2, 3):
+        dogs.get(pk=pk)
+    list(dogs.filter(age__gt=4))
+    stats = instrumentation.stats
+    [get] = [stats for shape, stats in stats.items() if "WHERE id=:id" in shape]
+    assert get["count"] == 3 and get["rows"] == 3 and sum(get["histogram"].values()) == 3
+    [scan] = [stats for shape, stats in stats.items() if "age > :__age" in shape]
+    assert scan["rows"] == 3
+    instrumentation.disable_stats()
+    assert instrumentation.stats == {}
+
+
+def test_slow_queries(caplog):
+    database = Database(":memory:", slow_query_threshold=0)
+    with caplog.at_level(logging.WARNING, logger="sqliter"):
+        database.raw("CREATE TABLE t (a INTEGER)")
+    assert "Slow query" in caplog.text
+    database.close()
@@ -0,0 +1,75 @@
+import sqlite3
+import threading
+
+import pytest
+
+from sqliter import Database, Fields
+
+
+@pytest.fixture(params=[0, 2], ids=["single", "pooled"])
+def database(request, tmp_path):
+    database = Database(str(tmp_path / "test.db"), readers=request.param)
+    database.create_table("dogs", id=Fields.Integer(pk=True), name=Fields.Text(null=False))
+    yield database
+    database.close()
+
+
+def test_writer_rolls_back_nested_writes(database):
+    dogs = database.table("dogs")
+    with pytest.raises(RuntimeError):
+        with database.writer():
+            dogs.create(name="Max")
+            dogs.create(name="Bella")
+            raise RuntimeError
+    assert dogs.all().count() == 0
+    with database.writer():
+        dogs.create(name="Max")
+        dogs.create(name="Bella")
+    assert dogs.all().count() == 2
+
+
+def test_reads_routing(database):
+    with database.reader() as reader:
+        with database.reader() as nested:
+            assert nested is reader
+        assert (reader is database.connection) == (not database.readers)
+        with database.writer() as writer:
+            with database.reader() as connection:
+                assert connection is writer     # sees the uncommitted writes
+
+
+def test_readers_are_read_only(database):
+    if not database.readers:
+        pytest.skip("no readers")
+    with database.reader() as reader:
+        with pytest.raises(sqlite3.OperationalError):
+            reader.execute("INSERT INTO dogs (name) VALUES ('Max')")
+
+
+def test_concurrent_reads_and_writes(database):
+    if not database.readers:
+        pytest.skip("single-threaded")
+    dogs = database.table("dogs")
+    errors = []
+
+    def write():
+        try:
+            for i in range(50):
+                dogs.create(name=f"dog {i}")
+        except Exception as e:
+            errors.append(e)
+
+    def read():
+        try:
+            for _ in range(50):
+                assert 0 <= dogs.all().count() <= 200
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=target) for target in (write, write, read, read, read)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert dogs.all().count() == 100
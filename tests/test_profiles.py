@@ -0,0 +1,37 @@
+import sqlite3
+
+import pytest
+
+from sqliter import Database, Fields
+
+
+def test_throughput_profile(tmp_path):
+    database = Database(str(tmp_path / "test.db"), profile="throughput", synchronous="FULL")
+    settings = database.settings
+    assert settings["journal_mode"] == "wal"
+    assert settings["synchronous"] == 2     # FULL overrides the NORMAL of the profile
+    assert settings["cache_size"] == -64000
+    assert settings["busy_timeout"] == 5000
+    database.close()
+
+
+def test_readonly_profile(tmp_path):
+    path = str(tmp_path / "test.db")
+    database = Database(path)
+    database.create_table("dogs", id=Fields.Integer(pk=True), name=Fields.Text(null=False)).create(name="Max")
+    database.close()
+    database = Database(path, profile="readonly")
+    dogs = database.table("dogs")
+    assert [dog.name for dog in dogs.all()] == ["Max"]
+    with pytest.raises(sqlite3.OperationalError):
+        dogs.create(name="Bella")
+    database.close()
+
+
+def test_invalid_settings():
+    with pytest.raises(AssertionError):
+        Database(":memory:", profile="fastest")
+    with pytest.raises(AssertionError):
+        Database(":memory:", foo=1)
+    with pytest.raises(AssertionError):
+        Database(":memory:", synchronous="OFF; DROP TABLE dogs")
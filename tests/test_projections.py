@@ -0,0 +1,16 @@
+import datetime
+
+
+def test_values(dogs):
+    assert list(dogs.filter(age__gt=6).values("name", "age")) == [{"name": "Bella", "age": 7}, {"name": "Molly", "age": 9}]
+    assert list(dogs.filter(age__gt=6).values_list("name", "age")) == [("Bella", 7), ("Molly", 9)]
+    assert list(dogs.filter(age__gt=6).values_list("name", flat=True)) == ["Bella", "Molly"]
+    assert list(dogs.filter(age__gt=6).tuples()) == [(3, "Bella", 7, 1), (5, "Molly", 9, None)]
+    assert dogs.all().order_by("-age").values("name").first() == {"name": "Molly"}
+
+
+def test_coerce(persons):
+    assert list(persons.filter(name="Bob").values_list("birthday")) == [("1990-10-10",)]
+    assert list(persons.filter(name="Bob").values_list("birthday", coerce=True)) == [(datetime.date(1990, 10, 10),)]
+    assert persons.filter(name="Bob").values("birthday", coerce=True).first() == \
+        {"birthday": datetime.date(1990, 10, 10)}
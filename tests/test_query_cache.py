@@ -0,0 +1,71 @@
+import threading
+
+from sqliter import Database, Fields
+
+
+def test_cached_until_changed(dogs, persons):
+    dogs.enable_query_cache()
+    queryset = dogs.filter(age__gt=4)
+    assert queryset.count() == 3
+    dogs.create(name="Rex", age=10, owner=1)
+    assert dogs.filter(age__gt=4).count() == 4
+    assert [dog.name for dog in dogs.filter(age__gt=4)] == ["Charlie", "Bella", "Molly", "Rex"]
+    assert dogs.all().count() == 6
+    persons.filter(name="Frank").delete()   # cascades to Lucy
+    assert dogs.all().count() == 5
+
+
+def test_cached_queries(dogs, selects):
+    dogs.enable_query_cache()
+    assert dogs.filter(age__gt=4).count() == 3
+    assert dogs.filter(age__gt=4).count() == 3
+    assert len(selects) == 1
+
+
+def test_projections_and_prefetch_are_cached_apart(dogs, selects):
+    dogs.enable_query_cache()
+    assert list(dogs.filter(name="Max").values("name")) == [{"name": "Max"}]
+    assert list(dogs.filter(name="Max").values_list("name")) == [("Max",)]
+    [dog] = dogs.filter(name="Max")
+    [dog] = dogs.filter(name="Max").prefetch_related("owner")
+    del selects[:]
+    assert dog.owner.name == "Bob"
+    assert selects == []
+
+
+def test_long_results_are_streamed_not_cached(dogs):
+    dogs.enable_query_cache(max_rows=2)
+    iterator = iter(dogs.all())
+    assert next(iterator).name == "Max"
+    iterator.close()
+    assert len(list(dogs.all())) == 5
+    assert len(dogs.query_cache) == 0
+    assert len(list(dogs.filter(age__lt=4))) == 2
+    assert len(dogs.query_cache) == 1
+
+
+def test_other_connections_writes(tmp_path):
+    name = str(tmp_path / "test.db")
+    database, other = Database(name, readers=1), Database(name)
+    dogs = database.create_table("dogs", id=Fields.Integer(pk=True), name=Fields.Text(null=False))
+    dogs.enable_query_cache()
+    assert dogs.all().count() == 0
+    other.table("dogs").create(name="Max")
+    assert dogs.all().count() == 1
+    database.close()
+    other.close()
+
+
+def test_invalidated_after_the_transaction(tmp_path):
+    database = Database(str(tmp_path / "test.db"), readers=2)
+    dogs = database.create_table("dogs", id=Fields.Integer(pk=True), name=Fields.Text(null=False))
+    dogs.enable_query_cache()
+    with database.writer():
+        dogs.create(name="Max")
+        # another thread reads, and caches, the rows committed so far
+        thread = threading.Thread(target=lambda: dogs.all().count())
+        thread.start()
+        thread.join(timeout=10)
+        assert not thread.is_alive()
+    assert dogs.all().count() == 1
+    database.close()
@@ -0,0 +1,58 @@
+import pytest
+
+from sqliter import Database, Fields
+
+
+@pytest.fixture
+def dogs():
+    database = Database(":memory:")
+    table = database.create_table(
+        "dogs",
+        id=Fields.Integer(pk=True),
+        name=Fields.Text(null=False),
+        age=Fields.Integer(null=False),
+    )
+    table.bulk_create({"name": f"dog {i}", "age": i % 15} for i in range(30))
+    yield table
+    database.close()
+
+
+def test_slices_are_independent(dogs):
+    qs = dogs.all().order_by("id")
+    first, second = qs[0:10], qs[10:20]
+    assert first is not second and first is not qs
+    assert [dog.id for dog in first] == list(range(1, 11))
+    assert [dog.id for dog in second] == list(range(11, 21))
+    assert [dog.id for dog in second[5:]] == list(range(16, 21))
+    assert qs.count() == 30
+
+
+def test_count_and_exists(dogs):
+    assert dogs.filter(age=3).count() == 2
+    assert dogs.all()[25:].count() == 5
+    assert dogs.all()[28:40].count() == 2
+    assert dogs.filter(age=3).exists()
+    assert not dogs.filter(age=30).exists()
+    assert not dogs.all()[30:].exists()
+
+
+def test_indexing(dogs):
+    qs = dogs.all().order_by("-id")
+    assert qs[0].id == 30
+    assert qs[10:20][3].id == 17
+    with pytest.raises(IndexError):
+        qs[30]
+    with pytest.raises(IndexError):
+        qs[10:20][10]
+
+
+def test_iterator_chunks(dogs):
+    qs = dogs.all().order_by("age")
+    assert [dog.id for dog in qs.iterator(chunk_size=4)] == [dog.id for dog in qs]
+    selects = []
+    dogs.database.set_trace_callback(selects.append)
+    assert len(list(qs.iterator(chunk_size=7))) == 30
+    dogs.database.set_trace_callback(None)
+    assert len(selects) == 5    # the last chunk is short
+    assert [dog.id for dog in qs[5:12].iterator(chunk_size=3)] == [dog.id for dog in qs[5:12]]
+    assert list(dogs.filter(age=3).values_list("id", flat=True).iterator(chunk_size=1)) == [4, 19]
@@ -0,0 +1,31 @@
+def test_foreign_keys_are_lazy(dogs, selects):
+    max_ = dogs.get(name="Max")
+    assert len(selects) == 1
+    assert max_.owner.name == "Bob"
+    assert max_.owner is max_.owner
+    assert len(selects) == 2
+    assert dogs.get(name="Molly").owner is None
+
+
+def test_foreign_key_assignment(dogs, persons):
+    max_ = dogs.get(name="Max")
+    frank = persons.get(name="Frank")
+    max_.owner = frank
+    assert max_.owner is frank
+    max_.save()
+    assert dogs.get(name="Max").owner.name == "Frank"
+    max_.owner = 3  # by primary key
+    assert max_.owner.name == "Alice"
+
+
+def test_select_related(dogs, selects):
+    owners = {dog.name: dog.owner and dog.owner.name for dog in dogs.all().select_related("owner")}
+    assert owners == {"Max": "Bob", "Charlie": "Bob", "Bella": "Bob", "Lucy": "Frank", "Molly": None}
+    assert len(selects) == 1
+
+
+def test_prefetch_related(dogs, selects):
+    owners = {dog.name: dog.owner and dog.owner.name for dog in dogs.all().prefetch_related("owner")}
+    assert owners == {"Max": "Bob", "Charlie": "Bob", "Bella": "Bob", "Lucy": "Frank", "Molly": None}
+    assert len(selects) == 2
+    assert dogs.filter(name="Max").prefetch_related("owner").first().owner.name == "Bob"
@@ -0,0 +1,37 @@
+import pytest
+
+from exceptions import NoSuchTable
+from sqliter import Database, Fields
+
+
+def test_tables_are_shared(database, persons, dogs):
+    assert database.table("dogs") is database.table("dogs") is dogs
+    assert {"persons", "dogs"} <= set(database.tables)
+    assert dogs.foreign_keys["owner"]["table"] == "persons"
+
+
+def test_schema_changes_reload_the_tables(database, persons):
+    database.raw("ALTER TABLE persons ADD COLUMN nickname TEXT")
+    assert "nickname" in database.table("persons").columns
+    database.table("persons").drop()
+    with pytest.raises(NoSuchTable):
+        database.table("persons")
+
+
+def test_invalidate_schema(database, persons):
+    database.invalidate_schema()
+    table = database.table("persons")
+    assert table is not persons and table.columns == persons.columns
+    other = database.create_table("other", id=Fields.Integer(pk=True))
+    assert database.table("other") is other
+
+
+def test_schema_changes_of_other_connections(tmp_path):
+    name = str(tmp_path / "test.db")
+    database, other = Database(name), Database(name)
+    database.create_table("dogs", id=Fields.Integer(pk=True))
+    other.table("dogs")
+    database.raw("ALTER TABLE dogs ADD COLUMN name TEXT")
+    assert "name" in other.table("dogs").columns    # through PRAGMA schema_version
+    database.close()
+    other.close()
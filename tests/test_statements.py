@@ -0,0 +1,43 @@
+import pytest
+
+from sqliter import Count, Database, Fields
+
+
+@pytest.fixture
+def dogs():
+    database = Database(":memory:")
+    table = database.create_table(
+        "dogs",
+        id=Fields.Integer(pk=True),
+        name=Fields.Text(null=False),
+        age=Fields.Integer(null=False),
+    )
+    yield table
+    database.close()
+
+
+def test_create_after_bulk_create(dogs):
+    # create() and the executemany bulk insert must not share a cached statement
+    dogs.bulk_create([{"name": "Max", "age": 3}])
+    entry = dogs.create(name="Bella", age=5)
+    assert (entry.name, entry.age) == ("Bella", 5)
+    dogs.bulk_create([{"name": "Lucy", "age": 1}])
+    assert dogs.all().count() == 3
+
+
+def test_annotate_without_group_by(dogs):
+    dogs.bulk_create({"name": name, "age": age} for name, age in [("Max", 3), ("Bella", 5)])
+    assert list(dogs.all().annotate(n=Count())) == [{"n": 2}]
+
+
+def test_pages_share_a_statement(dogs):
+    dogs.bulk_create({"name": f"dog {i}", "age": i % 15} for i in range(10))
+    statements = []
+    dogs.database.instrumentation.add_hook(before=lambda sql, parameters: statements.append(sql))
+    qs = dogs.all().order_by("id")
+    assert [[dog.id for dog in qs[start:start + 3]] for start in (0, 3, 6, 9)] == [[1, 2, 3], [4, 5, 6], [7, 8, 9], [10]]
+    assert qs[4].id == qs[2:][2].id == 5
+    assert [dog.id for dog in qs[2:8][1:3]] == [4, 5]
+    assert qs[2:8].count() == 6 and qs[8:].exists() and not qs[20:].exists()
+    assert len(set(statements[:4])) == 1
+    assert "LIMIT :__limit OFFSET :__offset" in statements[0]
@@ -0,0 +1,59 @@
+import asyncio
+
+from aio import AsyncDatabase
+from sqliter import Fields
+
+
+def test_upsert(persons, dogs):
+    alice = persons.upsert(conflict=("name",), name="Alice", city="Paris")
+    assert (alice.id, alice.city) == (3, "Paris")
+    carol = persons.upsert(conflict=("name",), name="Carol", city="Rome")
+    assert persons.get(name="Carol").id == carol.id
+    assert persons.upsert(conflict=("name",), update=[], name="Bob", city="Rome") is None
+    assert persons.get(name="Bob").city == "London"
+    assert dogs.all().count() == 5   # updated in place, ON DELETE CASCADE didn't fire
+
+
+def test_upsert_returning_pk(persons):
+    assert persons.upsert(conflict=("name",), returning=False, name="Carol", city="Rome") == \
+        persons.get(name="Carol").id
+    assert persons.upsert(conflict=("name",), returning=False, name="Alice", city="Paris") == 3
+    assert persons.upsert(conflict=("pk",), returning=False, id=1, name="Bob", city="Rome") == 1
+    assert persons.upsert(conflict=("name",), update=[], returning=False, name="Bob") is None
+    assert [person.city for person in persons.all()] == ["Rome", "Paris", "Paris", "Rome"]
+
+
+def test_bulk_upsert(persons):
+    rows = [dict(name="Bob", city="Rome"), dict(name="Dave", city="Oslo"), dict(name="Frank", city="Rome")]
+    pks = persons.bulk_upsert(rows, conflict=("name",), return_pks=True)
+    assert pks == [1, persons.get(name="Dave").id, 2]
+    persons.bulk_upsert([dict(name="Eve", city="Oslo")], conflict=("name",), batch_size=1)
+    assert {person.name: person.city for person in persons.all()} == \
+        {"Bob": "Rome", "Frank": "Rome", "Alice": "London", "Dave": "Oslo", "Eve": "Oslo"}
+
+
+def test_bulk_update(dogs):
+    entries = list(dogs.all())
+    for entry in entries:
+        entry.age += 10
+        entry.name = "changed"
+    dogs.bulk_update(entries, ["age"], batch_size=2)
+    assert [dog.age for dog in dogs.all()] == [13, 15, 17, 12, 19]
+    assert {dog.name for dog in dogs.all()} == {"Max", "Charlie", "Bella", "Lucy", "Molly"}
+
+
+def test_async_upsert(tmp_path):
+    async def main():
+        database = AsyncDatabase(str(tmp_path / "test.db"))
+        await database.create_table("persons", id=Fields.Integer(pk=True), name=Fields.Text(unique=True),
+                                    age=Fields.Integer())
+        persons = await database.table("persons")
+        await persons.bulk_upsert([dict(name="Bob", age=1), dict(name="Eve", age=2)], conflict=("name",))
+        bob = await persons.upsert(conflict=("name",), name="Bob", age=3)
+        bob.age = 4
+        await persons.bulk_update([bob], ["age"])
+        result = [(person.name, person.age) async for person in persons.all()]
+        await database.close()
+        return result
+
+    assert asyncio.run(main()) == [("Bob", 4), ("Eve", 2)]
@@ -1,5 +1,8 @@
+import itertools
+
+
 def scrub(text):
-    return "".join(c for c in text if c.isalnum() or c is "_")
+    return "".join(c for c in text if c.isalnum() or c == "_")
 
 
 def clean_kwargs(**kwargs):
@@ -18,3 +21,26 @@ def types_match(o, key, fields):
     if isinstance(o, list) and len(o):
         return all(isinstance(x, fields[key]["type"]) for x in o)
     return isinstance(o, fields[key]["type"])
+
+
+def chunks(iterable, size):
+    iterator = iter(iterable)
+    chunk = list(itertools.islice(iterator, size))
+    while chunk:
+        yield chunk
+        chunk = list(itertools.islice(iterator, size))
+
+
+def scanned_table(detail):
+    """
+    The table (or its alias) scanned without an index by an EXPLAIN QUERY PLAN step, None if none.
+    e.g.: SCAN dogs, SCAN TABLE dogs (before SQLite 3.36), SCAN TABLE dogs AS d,
+    but not SCAN dogs USING INDEX ..., nor SEARCH dogs USING INDEX ...
+    """
+    words = detail.split()
+    if not words or words[0] != "SCAN" or "USING" in words:
+        return None
+    words = words[2:] if words[1:2] == ["TABLE"] else words[1:]
+    if len(words) >= 3 and words[1] == "AS":
+        return words[2]
+    return words[0] if words else None